@@ -74,6 +74,16 @@ STATIC_ROOT = "/var/www/static/"
 # set the media root
 MEDIA_ROOT = os.environ.setdefault("MEDIA_ROOT", "/data/media")
 
+# GeoLocation index
+GEOLOCATION_INDEX = os.environ.setdefault("GEOLOCATION_INDEX", "/data/geolocation.idx")
+GEOCACHE_DOWNLOAD_DIR = os.environ.setdefault("GEOCACHE_DOWNLOAD_DIR", "/data/geocache")
+
+# Pagination of atlas search results
+ATLAS_SEARCH_PAGINATION = os.environ.setdefault("ATLAS_SEARCH_PAGINATION", "pages")
+ATLAS_SEARCH_COUNT_LIMIT = int(
+    os.environ.setdefault("ATLAS_SEARCH_COUNT_LIMIT", "1000")
+)
+
 # Sentry
 if os.environ.get("DJANGO_RAVEN_DSN"):
     # add sentry
@@ -226,6 +226,22 @@ EXCHANGE_BACKEND = "djmoney.contrib.exchange.backends.FixerBackend"
 FIXER_URL = "https://api.exchangerate.host/latest?symbols=" + ",".join(CURRENCIES)
 FIXER_ACCESS_KEY = "dummy"
 
+# On-disk index of GeoLocations written by 'geocache', set to None to disable
+GEOLOCATION_INDEX = os.path.join(BASE_DIR, "geolocation.idx")
+
+# Directory 'geocache' caches downloads in, set to None to disable
+GEOCACHE_DOWNLOAD_DIR = os.path.join(BASE_DIR, "geocache")
+
+# Pagination of atlas search results, either "pages" (numbered pages,
+# counting all results), "capped" (numbered pages, counting at most
+# ATLAS_SEARCH_COUNT_LIMIT results) or "keyset" (cursors, never counting).
+# Unless "pages", facets only count the first ATLAS_SEARCH_COUNT_LIMIT results.
+ATLAS_SEARCH_PAGINATION = "pages"
+ATLAS_SEARCH_COUNT_LIMIT = 1000
+
+# Seconds facet counts of atlas searches are cached for
+ATLAS_SEARCH_FACETS_TIMEOUT = 300
+
 # Donation receipts settings
 PDF_RENDER_SERVER = "http://localhost:3000"
 DONATION_RECEIPT_TEMPLATE = "donation_receipts/receipt_pdf.html"
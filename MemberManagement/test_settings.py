@@ -16,6 +16,10 @@ STRIPE_SECRET_KEY = None
 STRIPE_PUBLISHABLE_KEY = None
 STRIPE_WEBHOOK_SECRET = "useless-secret"
 
+# Don't use an on-disk GeoLocation index unless a test asks for one
+GEOLOCATION_INDEX = None
+GEOCACHE_DOWNLOAD_DIR = None
+
 # enforce minimization for the tests
 # so that we can test the production code
 HTML_MINIFY = True
@@ -0,0 +1,86 @@
+from django.db import DatabaseError, migrations, transaction
+
+# columns searched for substrings using icontains: by the admin, by 'city'
+# searches in the atlas, and by the atlas search without a full-text index
+TRIGRAM_COLUMNS = [
+    ("alumni_alumni", "givenName"),
+    ("alumni_alumni", "middleName"),
+    ("alumni_alumni", "familyName"),
+    ("alumni_alumni", "email"),
+    ("alumni_alumni", "existingEmail"),
+    ("alumni_approval", "gsuite"),
+    ("alumni_address", "city"),
+    ("payments_membershipinformation", "customer"),
+    ("atlas_searchdocument", "text"),
+]
+
+
+def _index_name(table, column):
+    return "{}_{}_trgm".format(table, column.lower())
+
+
+def _has_trigram_extension(schema_editor):
+    """Checks if pg_trgm is installed, and tries to install it otherwise"""
+
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute("SELECT 1 FROM pg_extension WHERE extname = 'pg_trgm'")
+        if cursor.fetchone() is not None:
+            return True
+
+    # installing an extension may need more privileges than migrations have
+    try:
+        with transaction.atomic(using=schema_editor.connection.alias):
+            schema_editor.execute("CREATE EXTENSION pg_trgm")
+    except DatabaseError as e:
+        print(
+            "\n  The pg_trgm extension is not installed and can't be created "
+            "({}), skipping trigram indexes. Run 'CREATE EXTENSION pg_trgm' as "
+            "a privileged user, then migrate alumni back to 0022 and forward "
+            "again to create them.".format(str(e).strip())
+        )
+        return False
+    return True
+
+
+def create_trigram_indexes(apps, schema_editor):
+    """Creates trigram indexes on PostgreSQL, does nothing elsewhere"""
+
+    if schema_editor.connection.vendor != "postgresql":
+        return
+    if not _has_trigram_extension(schema_editor):
+        return
+
+    # icontains compiles to 'UPPER("column"::text) LIKE UPPER(%s)', hence the
+    # indexes are on the same expression
+    qn = schema_editor.quote_name
+    for table, column in TRIGRAM_COLUMNS:
+        schema_editor.execute(
+            "CREATE INDEX IF NOT EXISTS {} ON {} USING GIN "
+            "((UPPER({}::text)) gin_trgm_ops)".format(
+                qn(_index_name(table, column)), qn(table), qn(column)
+            )
+        )
+
+
+def drop_trigram_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != "postgresql":
+        return
+
+    qn = schema_editor.quote_name
+    for table, column in TRIGRAM_COLUMNS:
+        schema_editor.execute(
+            "DROP INDEX IF EXISTS {}".format(qn(_index_name(table, column)))
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("alumni", "0022_jacobsdata_transferoptout"),
+        ("atlas", "0010_searchdocument"),
+        ("payments", "0010_paymentintent"),
+    ]
+
+    operations = [
+        migrations.RunPython(create_trigram_indexes, drop_trigram_indexes),
+    ]
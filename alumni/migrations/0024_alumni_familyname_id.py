@@ -0,0 +1,19 @@
+# Generated by Django 4.2.30 on 2026-10-18 18:43
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("alumni", "0023_trigram_indexes"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="alumni",
+            index=models.Index(
+                fields=["familyName", "id"], name="alumni_familyname_id"
+            ),
+        ),
+    ]
@@ -80,6 +80,12 @@ class Alumni(
     atlas: AtlasSettings
     membership: MembershipInformation
 
+    class Meta:
+        indexes = [
+            # keyset pagination of search results
+            models.Index(fields=["familyName", "id"], name="alumni_familyname_id"),
+        ]
+
 
 @Alumni.register_component(0)
 class Address(AlumniComponentMixin, models.Model):
@@ -118,8 +124,8 @@ class Address(AlumniComponentMixin, models.Model):
         """The coordinates of this user"""
         from atlas.models import GeoLocation
 
-        lat, lng = GeoLocation.getLoc(
-            self.country, self.zip, self.member.atlas.reducedAccuracy
+        [(lat, lng)] = GeoLocation.getLocMany(
+            [(self.country, self.zip, self.member.atlas.reducedAccuracy)]
         )
         if lat is None or lng is None:
             return [None, None]
@@ -129,13 +135,18 @@ class Address(AlumniComponentMixin, models.Model):
     @classmethod
     def all_valid_coords(cls) -> Iterable[List[float]]:
         """Returns the coordinates of all alumni"""
-        coords = map(
-            lambda x: x.coords,
-            cls.objects.filter(
-                member__atlas__included=True, member__approval__approval=True
-            ),
+        from atlas.models import GeoLocation
+
+        addresses = cls.objects.filter(
+            member__atlas__included=True, member__approval__approval=True
+        ).select_related("member__atlas")
+        coords = GeoLocation.getLocMany(
+            (address.country, address.zip, address.member.atlas.reducedAccuracy)
+            for address in addresses
         )
-        return filter(lambda c: c[0] is not None and c[1] is not None, coords)
+        return [
+            [lat, lng] for (lat, lng) in coords if lat is not None and lng is not None
+        ]
 
     @property
     def envelope_format(self):
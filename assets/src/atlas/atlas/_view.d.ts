@@ -1,3 +1,3 @@
 interface Window {
-    readonly atlas_people_coords: Array<[number, number]>;
+    readonly atlas_clusters_url: string;
 }
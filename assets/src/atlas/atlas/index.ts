@@ -4,27 +4,19 @@ async function init() {
     await import('ol/ol.css');
 
     const { Feature, Map, View } = await import(/* webpackChunkName: "ol" */ "ol");
-    const { fromLonLat } = await import(/* webpackChunkName: "olproj" */ 'ol/proj');
+    const { fromLonLat, toLonLat } = await import(/* webpackChunkName: "olproj" */ 'ol/proj');
     const { Point } = await import(/* webpackChunkName: "olgeom" */ 'ol/geom');
     const { Vector: VectorLayer, Tile } = await import(/* webpackChunkName: "ollayer" */ 'ol/layer');
-    const { Vector: VectorSource, Cluster, OSM } = await import(/* webpackChunkName: "olsource" */ 'ol/source');
+    const { Vector: VectorSource, OSM } = await import(/* webpackChunkName: "olsource" */ 'ol/source');
     const { Circle, Fill, Stroke, Style, Text } = await import(/* webpackChunkName: "olstyle" */ 'ol/style');
     const { defaults, FullScreen } = await import(/* webpackChunkName: "olcontrol" */ 'ol/control');
-    
-    // get the coordinates
-    const features = window.atlas_people_coords.map((p) => new Feature(new Point(fromLonLat([p[1], p[0]]))));
-    const source = new VectorSource({features});
-    
-    // create a cluster from this source
-    const clusterSource = new Cluster({
-        distance: 40,
-        source,
-    });
-    
-    
-    // create some clusters
+
+    // the clusters are computed by the server
+    const source = new VectorSource();
+
+    // create a layer to show the clusters
     const clusterLayer = new VectorLayer({
-        source: clusterSource,
+        source,
         style: (feature) => new Style({
             image: new Circle({
                 radius: 10,
@@ -32,17 +24,17 @@ async function init() {
                 fill: new Fill({ color: '#3399CC' })
             }),
             text: new Text({
-                text: (feature.get('features').length).toString(),
+                text: (feature.get('count')).toString(),
                 fill: new Fill({ color: '#fff' })
             })
         }),
     });
-    
+
     // the source for all the images is OpenStreetMap
     const osmTileLayer = new Tile({ source: new OSM() });
-    
+
     // finally: create a map
-    new Map({
+    const map = new Map({
         layers: [osmTileLayer, clusterLayer],
         controls: defaults().extend([
             new FullScreen() 
@@ -53,7 +45,58 @@ async function init() {
             zoom: 2
         })
     });
+
+    // wraps a longitude into [-180, 180), as toLonLat does not
+    const wrapLon = (lon: number) => ((lon + 180) % 360 + 360) % 360 - 180;
+    const clampLat = (lat: number) => Math.max(-90, Math.min(90, lat));
+
+    // load the clusters for the visible part of the map
+    let lastRequest = 0;
+    map.on('moveend', async () => {
+        const view = map.getView();
+        const zoom = Math.max(0, Math.round(view.getZoom() ?? 0));
+
+        const extent = view.calculateExtent(map.getSize());
+        let [west, south] = toLonLat([extent[0], extent[1]]);
+        let [east, north] = toLonLat([extent[2], extent[3]]);
+        if (extent[2] - extent[0] >= 2 * 20037508.34) {
+            west = -180;
+            east = 180;
+        } else {
+            // when the view crosses the antimeridian west ends up > east,
+            // which the server understands
+            west = wrapLon(west);
+            east = wrapLon(east);
+        }
+        south = clampLat(south);
+        north = clampLat(north);
+
+        const request = ++lastRequest;
+        let clusters: Array<[number, number, number]>;
+        try {
+            const response = await fetch(
+                `${window.atlas_clusters_url}?zoom=${zoom}&bbox=${south},${west},${north},${east}`,
+                { credentials: 'same-origin' },
+            );
+            if (!response.ok) {
+                throw new Error(`${response.status} ${await response.text()}`);
+            }
+            clusters = await response.json();
+        } catch (e) {
+            // keep showing the previous clusters
+            console.error('Unable to load clusters', e);
+            return;
+        }
+
+        // ignore responses that have been superseded
+        if (request !== lastRequest) return;
+
+        source.clear(true);
+        source.addFeatures(clusters.map(([lat, lon, count]) => new Feature({
+            geometry: new Point(fromLonLat([lon, lat])),
+            count,
+        })));
+    });
 }
 
 init();
-
@@ -5,3 +5,8 @@ from django.apps import AppConfig
 
 class AtlasConfig(AppConfig):
     name = "atlas"
+
+    def ready(self) -> None:
+        import atlas.signals
+
+        return super().ready()
@@ -0,0 +1,165 @@
+"""Synthetic data and measurements for benchmarking the geocache import.
+
+The generated files have the format of the postal code export of
+geonames.org, with realistic zip code formats and duplicate lines for
+zip codes shared by several places. Generation is deterministic for a
+given seed, hence benchmark runs are reproducible.
+"""
+
+from __future__ import annotations
+
+import random
+import resource
+import string
+import sys
+import time
+
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from typing import IO, Callable, Dict, Iterator, Tuple
+
+    # (weight, zip generator, (south, west, north, east))
+    Country = Tuple[int, Callable[[random.Random], str], Tuple[float, ...]]
+
+
+def _digits(n: int) -> Callable[[random.Random], str]:
+    return lambda rng: "".join(rng.choice(string.digits) for _ in range(n))
+
+
+def _ca(rng: random.Random) -> str:
+    # e.g. "K1A 0B1"
+    letters = "ABCEGHJKLMNPRSTVXY"
+    return "{}{}{} {}{}{}".format(
+        rng.choice(letters),
+        rng.choice(string.digits),
+        rng.choice(letters),
+        rng.choice(string.digits),
+        rng.choice(letters),
+        rng.choice(string.digits),
+    )
+
+
+def _gb(rng: random.Random) -> str:
+    # e.g. "SW1A 1AA", "M1 1AE" or "B33 8TH"
+    area = "".join(rng.choice(string.ascii_uppercase) for _ in range(rng.randint(1, 2)))
+    district = str(rng.randint(1, 99))
+    if rng.random() < 0.1:
+        district += rng.choice(string.ascii_uppercase)
+    return "{}{} {}{}".format(
+        area,
+        district,
+        rng.choice(string.digits),
+        "".join(rng.choice("ABDEFGHJLNPQRSTUWXYZ") for _ in range(2)),
+    )
+
+
+def _nl(rng: random.Random) -> str:
+    # e.g. "1011 AB"
+    return "{} {}".format(
+        rng.randint(1000, 9999),
+        "".join(rng.choice(string.ascii_uppercase) for _ in range(2)),
+    )
+
+
+COUNTRIES: Dict[str, Country] = {
+    "BR": (
+        10,
+        lambda rng: "{}-{}".format(_digits(5)(rng), _digits(3)(rng)),
+        (-33, -73, 5, -35),
+    ),
+    "CA": (8, _ca, (42, -141, 70, -52)),
+    "DE": (10, _digits(5), (47, 6, 55, 15)),
+    "FR": (5, _digits(5), (42, -5, 51, 8)),
+    "GB": (15, _gb, (50, -8, 59, 2)),
+    "IN": (8, _digits(6), (8, 68, 35, 97)),
+    "JP": (
+        12,
+        lambda rng: "{}-{}".format(_digits(3)(rng), _digits(4)(rng)),
+        (31, 130, 45, 145),
+    ),
+    "NL": (10, _nl, (51, 3, 53, 7)),
+    "US": (22, _digits(5), (25, -124, 49, -67)),
+}
+
+
+def _word(rng: random.Random) -> str:
+    return "".join(
+        rng.choice(string.ascii_lowercase) for _ in range(rng.randint(4, 12))
+    ).capitalize()
+
+
+def synthetic_lines(count: int, seed: int = 0) -> Iterator[str]:
+    """Generates count lines of a synthetic export, grouped by country"""
+
+    rng = random.Random(seed)
+    total = sum(weight for weight, _, _ in COUNTRIES.values())
+
+    produced = 0
+    for index, (country, (weight, make_zip, bbox)) in enumerate(
+        sorted(COUNTRIES.items())
+    ):
+        if index == len(COUNTRIES) - 1:
+            quota = count - produced
+        else:
+            quota = min(count - produced, count * weight // total)
+
+        south, west, north, east = bbox
+        groups = [(_word(rng), str(rng.randint(1, 99))) for _ in range(20)]
+
+        emitted = 0
+        while emitted < quota:
+            zip = make_zip(rng)
+            group = rng.choice(groups)
+            lat = rng.uniform(south, north)
+            lon = rng.uniform(west, east)
+
+            # zip codes are often shared by several places
+            for _ in range(min(quota - emitted, rng.choice([1, 1, 1, 2, 3]))):
+                yield "\t".join(
+                    [
+                        country,
+                        zip,
+                        _word(rng),
+                        group[0],
+                        group[1],
+                        _word(rng),
+                        str(rng.randint(1, 999)),
+                        "",
+                        "",
+                        "{:.4f}".format(lat + rng.uniform(-0.01, 0.01)),
+                        "{:.4f}".format(lon + rng.uniform(-0.01, 0.01)),
+                        "4",
+                    ]
+                ) + "\n"
+                emitted += 1
+        produced += quota
+
+
+def write_synthetic(f: IO[str], count: int, seed: int = 0) -> None:
+    """Writes a synthetic export of count lines to f"""
+    f.writelines(synthetic_lines(count, seed))
+
+
+def peak_rss() -> int:
+    """Returns the peak resident set size (in bytes) of this process and its
+    terminated children"""
+
+    # ru_maxrss is in kilobytes on linux, and in bytes on macOS
+    scale = 1 if sys.platform == "darwin" else 1024
+    return scale * max(
+        resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+        resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss,
+    )
+
+
+class Timer(object):
+    """Measures the wall-clock time of a with block"""
+
+    def __enter__(self) -> Timer:
+        self.start = time.perf_counter()
+        self.seconds = 0.0
+        return self
+
+    def __exit__(self, *args) -> None:
+        self.seconds = time.perf_counter() - self.start
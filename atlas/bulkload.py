@@ -0,0 +1,176 @@
+"""Fast bulk inserts of many unsaved model instances.
+
+Instances are streamed into the database using the fastest method the
+database backend supports, without going through the ORM per object:
+
+- PostgreSQL: COPY FROM STDIN into a temporary table, followed by a single
+  INSERT ... SELECT which drops duplicate and conflicting rows
+- SQLite: batches of INSERT OR IGNORE using executemany
+- others: batches of bulk_create
+
+In all cases rows conflicting with a unique constraint are ignored, and
+of several duplicate instances only the first one is kept.
+"""
+
+from __future__ import annotations
+
+import itertools
+import uuid
+
+from django.db import connection, transaction
+
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from typing import Any, Iterable, Iterator, List, Optional, Tuple, Type
+    from django.db.models import Field, Model
+
+
+def batched(iterable: Iterable[Any], size: int) -> Iterator[List[Any]]:
+    """Splits an iterable into lists of at most size elements"""
+    iterator = iter(iterable)
+    while True:
+        batch = list(itertools.islice(iterator, size))
+        if not batch:
+            return
+        yield batch
+
+
+def insert(model: Type[Model], objs: Iterable[Model], batch_size: int) -> int:
+    """Inserts objects into the table of model, ignoring conflicts.
+    Returns the number of objects attempted to insert."""
+
+    fields = [f for f in model._meta.concrete_fields if not f.primary_key]
+    rows = (_row(obj, fields) for obj in objs)
+
+    if connection.vendor == "postgresql":
+        return _insert_postgresql(model, fields, rows)
+    if connection.vendor == "sqlite":
+        return _insert_sqlite(model, fields, rows, batch_size)
+
+    count = 0
+    for batch in batched(objs, batch_size):
+        model.objects.bulk_create(batch, ignore_conflicts=True)
+        count += len(batch)
+    return count
+
+
+def _row(obj: Model, fields: List[Field]) -> Tuple[Any, ...]:
+    return tuple(
+        f.get_db_prep_save(getattr(obj, f.attname), connection) for f in fields
+    )
+
+
+def _insert_sqlite(
+    model: Type[Model],
+    fields: List[Field],
+    rows: Iterable[Tuple[Any, ...]],
+    batch_size: int,
+) -> int:
+    qn = connection.ops.quote_name
+    sql = "INSERT OR IGNORE INTO {} ({}) VALUES ({})".format(
+        qn(model._meta.db_table),
+        ", ".join(qn(f.column) for f in fields),
+        ", ".join(["%s"] * len(fields)),
+    )
+
+    count = 0
+    for batch in batched(rows, batch_size):
+        with transaction.atomic(), connection.cursor() as cursor:
+            cursor.executemany(sql, batch)
+        count += len(batch)
+    return count
+
+
+def _insert_postgresql(
+    model: Type[Model], fields: List[Field], rows: Iterable[Tuple[Any, ...]]
+) -> int:
+    from django.db.backends.postgresql.psycopg_any import is_psycopg3
+
+    qn = connection.ops.quote_name
+    table = qn(model._meta.db_table)
+    temp = qn("bulkload_{}".format(uuid.uuid4().hex))
+    columns = ", ".join(qn(f.column) for f in fields)
+
+    # the first instance is kept among several with the same unique key
+    unique = [
+        qn(model._meta.get_field(name).column)
+        for name in (model._meta.unique_together or [()])[0]
+    ]
+    if unique:
+        select = "SELECT DISTINCT ON ({0}) {1} FROM {2} ORDER BY {0}, seq".format(
+            ", ".join(unique), columns, temp
+        )
+    else:
+        select = "SELECT {} FROM {} ORDER BY seq".format(columns, temp)
+
+    numbered = ((*row, seq) for seq, row in enumerate(rows))
+    copy = "COPY {} ({}, seq) FROM STDIN".format(temp, columns)
+
+    with transaction.atomic(), connection.cursor() as cursor:
+        # a temporary table without any constraints, numbering the rows
+        cursor.execute(
+            "CREATE TEMPORARY TABLE {} ON COMMIT DROP AS "
+            "SELECT {}, 0::bigint AS seq FROM {} WITH NO DATA".format(
+                temp, columns, table
+            )
+        )
+
+        if is_psycopg3:
+            count = 0
+            with cursor.copy(copy) as copier:
+                for row in numbered:
+                    copier.write_row(row)
+                    count += 1
+        else:
+            reader = CopyReader(numbered)
+            cursor.copy_expert(copy, reader)
+            count = reader.count
+
+        cursor.execute(
+            "INSERT INTO {} ({}) {} ON CONFLICT DO NOTHING".format(
+                table, columns, select
+            )
+        )
+        cursor.execute("DROP TABLE {}".format(temp))
+
+    return count
+
+
+def copy_line(row: Tuple[Any, ...]) -> str:
+    """Encodes a row in the text format of COPY"""
+    return "\t".join(_copy_value(value) for value in row) + "\n"
+
+
+def _copy_value(value: Any) -> str:
+    if value is None:
+        return "\\N"
+    return (
+        str(value)
+        .replace("\\", "\\\\")
+        .replace("\t", "\\t")
+        .replace("\n", "\\n")
+        .replace("\r", "\\r")
+    )
+
+
+class CopyReader(object):
+    """A file-like object streaming rows in the text format of COPY"""
+
+    def __init__(self, rows: Iterable[Tuple[Any, ...]]):
+        self.rows = iter(rows)
+        self.buffer = b""
+        self.count = 0
+
+    def read(self, size: Optional[int] = -1) -> bytes:
+        while size is None or size < 0 or len(self.buffer) < size:
+            row = next(self.rows, None)
+            if row is None:
+                break
+            self.buffer += copy_line(row).encode("utf-8")
+            self.count += 1
+
+        if size is None or size < 0:
+            size = len(self.buffer)
+        data, self.buffer = self.buffer[:size], self.buffer[size:]
+        return data
@@ -0,0 +1,165 @@
+"""Server-side clustering of member locations for the atlas map.
+
+Points are bucketed into a fixed grid inside each web mercator tile. The
+clusters of each tile are cached per (version, zoom, tile), hence the
+work per request and the size of the response only depend on the size of
+the viewport, not on the number of members.
+"""
+
+from __future__ import annotations
+
+import math
+
+from django.core.cache import cache
+
+from atlas.models import MemberLocation
+
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from typing import Iterable, List, Sequence, Tuple
+
+# number of grid cells per tile side
+GRID_SIZE = 8
+
+# zoom levels supported by the clustering
+MAX_ZOOM = 20
+
+# maximum number of tiles a single request may cover, larger bounding
+# boxes are cropped around their center
+MAX_TILES = 128
+
+# seconds the clusters of a tile are cached for
+CACHE_TIMEOUT = 60 * 60
+
+# latitude bounds of the web mercator projection
+MAX_LAT = 85.0511287798
+
+# margin (in degrees) used when querying the points of a tile
+EPSILON = 1e-9
+
+
+class ClusteringError(Exception):
+    pass
+
+
+def _x_fraction(lon: float) -> float:
+    return (lon + 180.0) / 360.0
+
+
+def _y_fraction(lat: float) -> float:
+    lat = max(-MAX_LAT, min(MAX_LAT, lat))
+    rad = math.radians(lat)
+    return (1.0 - math.log(math.tan(rad) + 1.0 / math.cos(rad)) / math.pi) / 2.0
+
+
+def _tile(position: float, n: int) -> int:
+    """Returns the index of the tile (or cell) containing a position in [0, n]"""
+    return min(n - 1, max(0, int(position)))
+
+
+def _lon(x_fraction: float) -> float:
+    return x_fraction * 360.0 - 180.0
+
+
+def _lat(y_fraction: float) -> float:
+    return math.degrees(math.atan(math.sinh(math.pi * (1.0 - 2.0 * y_fraction))))
+
+
+def tiles_for_bbox(
+    zoom: int, south: float, west: float, north: float, east: float
+) -> List[Tuple[int, int]]:
+    """Returns the (x, y) tiles that cover the given bounding box.
+    When west > east the bounding box is assumed to cross the antimeridian."""
+
+    if zoom < 0 or zoom > MAX_ZOOM:
+        raise ClusteringError("Zoom level must be between 0 and {}".format(MAX_ZOOM))
+
+    n = 2**zoom
+
+    def tile(fraction: float) -> int:
+        return _tile(fraction * n, n)
+
+    ys = range(tile(_y_fraction(north)), tile(_y_fraction(south)) + 1)
+
+    west_x, east_x = tile(_x_fraction(west)), tile(_x_fraction(east))
+    if west <= east:
+        xs = list(range(west_x, east_x + 1))
+    else:
+        xs = list(range(west_x, n)) + list(range(0, east_x + 1))
+
+    # crop too large boxes around their center, keeping their aspect ratio
+    if len(xs) * len(ys) > MAX_TILES:
+        scale = math.sqrt(MAX_TILES / (len(xs) * len(ys)))
+        xs = _crop(xs, max(1, int(len(xs) * scale)))
+        ys = _crop(ys, MAX_TILES // len(xs))
+
+    return [(x, y) for x in xs for y in ys]
+
+
+def _crop(values: Sequence[int], count: int) -> Sequence[int]:
+    """Returns count values from the middle of values"""
+    start = max(0, (len(values) - count) // 2)
+    return values[start : start + count]
+
+
+def tile_clusters(
+    version: str, zoom: int, x: int, y: int
+) -> List[Tuple[float, float, int]]:
+    """Returns the (lat, lon, count) clusters of a single tile.
+    Results are cached for the given version of the member locations."""
+
+    key = "atlas.clusters.{}.{}.{}.{}".format(version, zoom, x, y)
+    clusters = cache.get(key)
+    if clusters is None:
+        clusters = _compute_tile_clusters(zoom, x, y)
+        cache.set(key, clusters, CACHE_TIMEOUT)
+    return clusters
+
+
+def _compute_tile_clusters(zoom: int, x: int, y: int) -> List[Tuple[float, float, int]]:
+    n = 2**zoom
+
+    # bounds of the tile, with a small margin against rounding errors
+    west, east = _lon(x / n) - EPSILON, _lon((x + 1) / n) + EPSILON
+    north, south = _lat(y / n) + EPSILON, _lat((y + 1) / n) - EPSILON
+
+    locations = MemberLocation.objects.filter(
+        lat__gte=south if y < n - 1 else -90.0,
+        lat__lte=north if y > 0 else 90.0,
+        lon__gte=west,
+        lon__lte=east,
+    ).values_list("lat", "lon")
+
+    # bucket all the points into the grid cells of this tile
+    cells = {}
+    for lat, lon in locations:
+        tx, ty = _x_fraction(lon) * n, _y_fraction(lat) * n
+
+        # points on the border only belong to a single tile
+        if _tile(tx, n) != x or _tile(ty, n) != y:
+            continue
+
+        cell = (
+            _tile((tx - x) * GRID_SIZE, GRID_SIZE),
+            _tile((ty - y) * GRID_SIZE, GRID_SIZE),
+        )
+
+        sum_lat, sum_lon, count = cells.get(cell, (0.0, 0.0, 0))
+        cells[cell] = (sum_lat + lat, sum_lon + lon, count + 1)
+
+    return [
+        (sum_lat / count, sum_lon / count, count)
+        for (_, (sum_lat, sum_lon, count)) in sorted(cells.items())
+    ]
+
+
+def clusters_for_tiles(
+    version: str, zoom: int, tiles: Iterable[Tuple[int, int]]
+) -> List[Tuple[float, float, int]]:
+    """Returns all clusters within the given tiles"""
+
+    clusters = []
+    for x, y in tiles:
+        clusters.extend(tile_clusters(version, zoom, x, y))
+    return clusters
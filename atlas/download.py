@@ -0,0 +1,197 @@
+"""An on-disk cache for downloads of large, rarely changing files.
+
+Each url is cached as a data file next to a metadata file, which stores
+the validators sent by the server and the sha256 checksum of the data:
+
+    <name>       the complete file
+    <name>.json  {"url", "etag", "last_modified", "size", "sha256"}
+    <name>.part  an incomplete download, resumed with a Range request
+    <name>.part.json  the validators of the incomplete download
+    <name>.imported.json  {"sha256", "etag"} of the data last imported
+
+Downloads of cached files are conditional, hence an unchanged file is
+never transferred again. Consumers record which data they have processed
+with mark_imported only once they succeeded, so that a download is
+processed again after a failure, even when it is unchanged.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+
+import requests
+from tqdm import tqdm
+
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from typing import Any, Dict, Optional, Tuple
+
+# size of the chunks downloads are written and hashed in
+CHUNK_SIZE = 1024 * 1024
+
+# timeout (in seconds) for connecting to and reading from the server
+TIMEOUT = 60
+
+
+class DownloadError(Exception):
+    pass
+
+
+def cache_path(cache_dir: str, url: str) -> str:
+    """Returns the path the given url is cached at"""
+    name = os.path.basename(url.split("?", 1)[0]) or "download"
+    digest = hashlib.sha1(url.encode("utf-8")).hexdigest()[:16]
+    return os.path.join(cache_dir, "{}-{}".format(digest, name))
+
+
+def sha256sum(path: str) -> str:
+    """Computes the sha256 checksum of a file"""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(CHUNK_SIZE), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _read_json(path: str) -> Optional[Dict[str, Any]]:
+    try:
+        with open(path, "r") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _write_json(path: str, data: Dict[str, Any]) -> None:
+    tmp = "{}.tmp".format(path)
+    with open(tmp, "w") as f:
+        json.dump(data, f)
+    os.replace(tmp, path)
+
+
+def cached_metadata(path: str) -> Optional[Dict[str, Any]]:
+    """Returns the metadata of a cached file, if it exists and is intact"""
+
+    metadata = _read_json(path + ".json")
+    if metadata is None or not os.path.exists(path):
+        return None
+    if os.path.getsize(path) != metadata.get("size"):
+        return None
+    if sha256sum(path) != metadata.get("sha256"):
+        return None
+    return metadata
+
+
+def mark_imported(path: str) -> None:
+    """Records that the data currently cached at path has been imported"""
+    metadata = _read_json(path + ".json") or {}
+    _write_json(
+        path + ".imported.json",
+        {"sha256": metadata.get("sha256"), "etag": metadata.get("etag")},
+    )
+
+
+def is_imported(path: str) -> bool:
+    """Checks if the data currently cached at path has been imported"""
+    metadata = _read_json(path + ".json")
+    imported = _read_json(path + ".imported.json")
+    if metadata is None or imported is None or not metadata.get("sha256"):
+        return False
+    return imported.get("sha256") == metadata["sha256"]
+
+
+def _validators(response: requests.Response) -> Dict[str, Optional[str]]:
+    return {
+        "etag": response.headers.get("ETag"),
+        "last_modified": response.headers.get("Last-Modified"),
+    }
+
+
+def fetch(url: str, cache_dir: str, progress: bool = True) -> Tuple[str, bool]:
+    """Downloads url into cache_dir, unless the cached copy is up to date.
+    Returns the path of the cached file, and if it has changed."""
+
+    os.makedirs(cache_dir, exist_ok=True)
+    path = cache_path(cache_dir, url)
+    part = path + ".part"
+
+    headers = {}
+
+    # ask the server if the cached copy is still up to date
+    metadata = cached_metadata(path)
+    if metadata is not None:
+        if metadata.get("etag"):
+            headers["If-None-Match"] = metadata["etag"]
+        if metadata.get("last_modified"):
+            headers["If-Modified-Since"] = metadata["last_modified"]
+
+    # resume an incomplete download, if it still is the same file
+    offset = 0
+    partial = _read_json(part + ".json")
+    if partial is not None and os.path.exists(part):
+        validator = partial.get("etag") or partial.get("last_modified")
+        if validator:
+            offset = os.path.getsize(part)
+            headers["Range"] = "bytes={}-".format(offset)
+            headers["If-Range"] = validator
+
+    response = requests.get(url, headers=headers, stream=True, timeout=TIMEOUT)
+    with response:
+        if response.status_code == 304 and metadata is not None:
+            return path, False
+
+        if response.status_code == 206 and offset > 0:
+            mode = "ab"
+        elif response.status_code == 200:
+            mode, offset = "wb", 0
+        else:
+            # don't try to resume from the incomplete download again
+            for fn in (part, part + ".json"):
+                if os.path.exists(fn):
+                    os.remove(fn)
+            raise DownloadError(
+                "Unexpected response {} for {}".format(response.status_code, url)
+            )
+
+        # remember the validators, so that the download can be resumed
+        if mode == "wb":
+            _write_json(part + ".json", _validators(response))
+
+        length = int(response.headers.get("Content-Length", 0)) or None
+        pbar = tqdm(
+            total=(offset + length) if length else None,
+            initial=offset,
+            unit="B",
+            unit_scale=True,
+            desc="Downloading",
+            disable=not progress,
+        )
+        with open(part, mode) as f:
+            for chunk in response.iter_content(chunk_size=CHUNK_SIZE):
+                if chunk:
+                    f.write(chunk)
+                    pbar.update(len(chunk))
+        pbar.close()
+
+        validators = _validators(response)
+
+    size = os.path.getsize(part)
+    if length is not None and size != offset + length:
+        raise DownloadError("Download of {} is incomplete".format(url))
+
+    # replace the cached copy
+    os.replace(part, path)
+    _write_json(
+        path + ".json",
+        {
+            "url": url,
+            "size": size,
+            "sha256": sha256sum(path),
+            **(_read_json(part + ".json") or validators),
+        },
+    )
+    os.remove(part + ".json")
+
+    return path, True
@@ -0,0 +1,84 @@
+"""Facet counts of search results.
+
+For each facet, the results are counted by value with one grouped
+aggregate query. Counts are cached for a short time, so that paging
+through (or repeating) a search does not count again.
+
+Broad searches can be counted within a sample of limited size instead,
+see capped_counts, so that they don't scan all results.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+
+from django.core.cache import cache
+from django.db.models import Count
+
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple, TypeVar
+    from django.db.models import QuerySet
+
+    # (name, field, choices)
+    Facet = Tuple[str, str, Iterable[Tuple[Any, str]]]
+
+    # (value, label, count)
+    FacetCount = Tuple[Any, str, int]
+
+    T = TypeVar("T")
+
+
+def counts(queryset: QuerySet, facets: List[Facet]) -> Dict[str, List[FacetCount]]:
+    """Counts the objects of queryset by the value of each facet, the most
+    frequent values first. Objects without a value are not counted."""
+
+    queryset = queryset.order_by()
+
+    result = {}
+    for name, field, choices in facets:
+        labels = dict(choices)
+        rows = (
+            queryset.exclude(**{"{}__isnull".format(field): True})
+            .values_list(field)
+            .annotate(count=Count("pk"))
+            .order_by("-count", field)
+        )
+        result[name] = [
+            (value, str(labels.get(value, value)), count) for value, count in rows
+        ]
+    return result
+
+
+def capped_counts(
+    queryset: QuerySet, facets: List[Facet], limit: Optional[int]
+) -> Tuple[Dict[str, List[FacetCount]], bool]:
+    """Like counts, but only counts (at most) limit objects of queryset,
+    unless limit is None. Returns the counts, and if there were more objects
+    than counted."""
+
+    if limit is None:
+        return counts(queryset, facets), False
+
+    pks = queryset.order_by().values("pk")
+    capped = pks[: limit + 1].count() > limit
+    if capped:
+        queryset = queryset.model.objects.filter(pk__in=pks[:limit])
+    return counts(queryset, facets), capped
+
+
+def cached_counts(key: Any, compute: Callable[[], T], timeout: int) -> T:
+    """Returns the facet counts cached for key, computing them if needed"""
+
+    digest = hashlib.sha1(
+        json.dumps(key, sort_keys=True, default=str).encode("utf-8")
+    ).hexdigest()
+    cache_key = "atlas.facets.{}".format(digest)
+
+    result = cache.get(cache_key)
+    if result is None:
+        result = compute()
+        cache.set(cache_key, result, timeout)
+    return result
@@ -0,0 +1,122 @@
+"""Full-text searches over the SearchDocuments of members.
+
+SearchDocuments are indexed by an external content FTS5 table on SQLite,
+kept in sync by triggers, and by a GIN index over their tsvector on
+PostgreSQL. Both are created by migrations. Each word of a search matches
+words of a document starting with it, and results can be ranked by their
+relevance. Without a full-text index, documents are searched with
+icontains, which still avoids joining the component tables.
+"""
+
+from __future__ import annotations
+
+import functools
+import operator
+import re
+
+from django.db import connection
+from django.db.models import F, Q
+from django.db.models.expressions import RawSQL
+
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from typing import List, Optional
+    from django.db.models import QuerySet
+
+# names of the FTS5 table and the PostgreSQL index
+FTS_TABLE = "atlas_searchdocument_fts"
+GIN_INDEX = "atlas_searchdocument_text_gin"
+
+# text search configuration used on PostgreSQL
+TS_CONFIG = "simple"
+
+WORD = re.compile(r"\w+", re.UNICODE)
+
+_available = {}
+
+
+def words(text: str) -> List[str]:
+    """Splits text into the words that are searched for"""
+    return [w.lower() for w in WORD.findall(text)]
+
+
+def backend() -> Optional[str]:
+    """Returns the vendor of the full-text index in use, or None"""
+
+    key = (connection.vendor, connection.settings_dict["NAME"])
+    if key not in _available:
+        if connection.vendor == "sqlite":
+            with connection.cursor() as cursor:
+                available = FTS_TABLE in connection.introspection.table_names(cursor)
+        else:
+            available = connection.vendor == "postgresql"
+        _available[key] = connection.vendor if available else None
+    return _available[key]
+
+
+def _match_expression(terms: List[str]) -> str:
+    if backend() == "sqlite":
+        return " AND ".join('"{}"*'.format(w.replace('"', '""')) for w in terms)
+    return " & ".join("{}:*".format(w) for w in terms)
+
+
+def _matching_sql() -> str:
+    """SQL selecting the ids of members matching a match expression"""
+
+    qn = connection.ops.quote_name
+    if backend() == "sqlite":
+        return "SELECT rowid FROM {0} WHERE {0} MATCH %s".format(qn(FTS_TABLE))
+    return (
+        "SELECT member_id FROM atlas_searchdocument "
+        "WHERE to_tsvector('{0}', text) @@ to_tsquery('{0}', %s)".format(TS_CONFIG)
+    )
+
+
+def text_query(text: str) -> Q:
+    """Returns a query for the Alumni whose search document contains words
+    starting with every word of text"""
+
+    terms = words(text)
+    if backend() is None or not terms:
+        return functools.reduce(
+            operator.and_,
+            (Q(search_document__text__icontains=bit) for bit in text.split()),
+        )
+
+    return Q(pk__in=RawSQL(_matching_sql(), [_match_expression(terms)]))
+
+
+def order_by_rank(queryset: QuerySet, texts: List[str], *ordering: str) -> QuerySet:
+    """Orders a queryset of Alumni by the relevance of their search document
+    to the given texts, using ordering for equally relevant ones"""
+
+    terms = [w for text in texts for w in words(text)]
+    if backend() is None or not terms:
+        return queryset.order_by(*ordering)
+
+    qn = connection.ops.quote_name
+    member = "{}.{}".format(
+        qn(queryset.model._meta.db_table), qn(queryset.model._meta.pk.column)
+    )
+    expression = _match_expression(terms)
+
+    # the best matches come first
+    if backend() == "sqlite":
+        rank = RawSQL(
+            "(SELECT -bm25({0}) FROM {0} WHERE {0} MATCH %s AND rowid = {1})".format(
+                qn(FTS_TABLE), member
+            ),
+            [expression],
+        )
+    else:
+        rank = RawSQL(
+            "(SELECT ts_rank(to_tsvector('{0}', text), to_tsquery('{0}', %s)) "
+            "FROM atlas_searchdocument WHERE member_id = {1})".format(
+                TS_CONFIG, member
+            ),
+            [expression],
+        )
+    return queryset.annotate(rank=rank).order_by(
+        F("rank").desc(nulls_last=True), *ordering
+    )
@@ -0,0 +1,267 @@
+"""A compact, memory-mappable on-disk index of GeoLocations.
+
+The index is written by the 'geocache' command after every import and
+allows resolving (country, zip) pairs without a database round trip.
+Worker processes map the file lazily and share its pages via mmap. When
+the file is replaced by a new import, it is picked up automatically.
+
+The file consists of a header, a sorted array of fixed-size records and a
+table of (deduplicated) administrative group names:
+
+    header:  magic b"JAGI", uint16 format version, uint16 reserved,
+             uint32 record count, uint64 creation time (ns)
+    record:  12 byte key (2 byte country code, 10 byte zero-padded zip),
+             float64 lat, float64 lon, uint32 group offset, uint32 group length
+    groups:  utf-8 encoded, tab-separated group1, group2 and group3
+
+All numbers are little-endian.
+"""
+
+from __future__ import annotations
+
+import heapq
+import mmap
+import os
+import struct
+import tempfile
+import threading
+import time
+
+from django.conf import settings
+
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from typing import IO, Dict, Iterable, Iterator, List, Optional, Tuple
+
+    # (country, zip, group1, group2, group3, lat, lon)
+    Row = Tuple[str, str, str, str, str, float, float]
+
+MAGIC = b"JAGI"
+VERSION = 1
+
+HEADER = struct.Struct("<4sHHIQ")
+RECORD = struct.Struct("<12sddII")
+
+COUNTRY_LENGTH = 2
+ZIP_LENGTH = 10
+KEY_LENGTH = COUNTRY_LENGTH + ZIP_LENGTH
+
+# while writing, records are tagged with the order they were added in
+SEQUENCE = struct.Struct(">Q")
+ENTRY_SIZE = RECORD.size + SEQUENCE.size
+
+# number of records sorted in memory at once while writing
+RUN_SIZE = 100000
+
+
+class GeoIndexError(Exception):
+    pass
+
+
+def _make_key(country: str, zip: str) -> Optional[bytes]:
+    """Encodes a (country, zip) pair into a key, or None if it can't be encoded"""
+    country = country.encode("utf-8")
+    zip = zip.encode("utf-8")
+    if len(country) != COUNTRY_LENGTH or len(zip) > ZIP_LENGTH:
+        return None
+    return country + zip.ljust(ZIP_LENGTH, b"\0")
+
+
+class IndexWriter(object):
+    """Builds an index from rows added one at a time, in any order.
+
+    Records are not kept in memory: they are spilled to temporary files in
+    sorted runs of at most RUN_SIZE records, which are merged when writing
+    the index. Only the (deduplicated) group names are kept in memory.
+    """
+
+    def __init__(self):
+        self.runs: List[IO[bytes]] = []
+        self.run: List[bytes] = []
+        self.added = 0
+        self.groups: Dict[str, Tuple[int, int]] = {}
+        self.group_table = bytearray()
+
+    def add(self, row: Row) -> None:
+        """Adds a row to the index, unless it can't be encoded"""
+
+        country, zip, group1, group2, group3, lat, lon = row
+        key = _make_key(country, zip)
+        if key is None:
+            return
+
+        names = "\t".join((group1, group2, group3))
+        if names not in self.groups:
+            encoded = names.encode("utf-8")
+            self.groups[names] = (len(self.group_table), len(encoded))
+            self.group_table += encoded
+
+        offset, length = self.groups[names]
+        record = RECORD.pack(key, lat, lon, offset, length)
+
+        # entries sort by key, and then by the order they were added in
+        self.run.append(
+            record[:KEY_LENGTH] + SEQUENCE.pack(self.added) + record[KEY_LENGTH:]
+        )
+        self.added += 1
+        if len(self.run) >= RUN_SIZE:
+            self._spill()
+
+    def _spill(self) -> None:
+        """Writes the current run to a temporary file"""
+        if not self.run:
+            return
+
+        self.run.sort()
+        f = tempfile.TemporaryFile()
+        f.writelines(self.run)
+        f.seek(0)
+        self.runs.append(f)
+        self.run = []
+
+    @staticmethod
+    def _read_run(f: IO[bytes]) -> Iterator[bytes]:
+        """Reads the entries of a run"""
+        while True:
+            chunk = f.read(ENTRY_SIZE * 4096)
+            if not chunk:
+                break
+            for i in range(0, len(chunk), ENTRY_SIZE):
+                yield chunk[i : i + ENTRY_SIZE]
+
+    def write(self, path: str) -> int:
+        """Writes the index to path, replacing any existing index atomically.
+        Of several records with the same key only the first one is kept.
+        Returns the number of records written."""
+
+        self._spill()
+
+        # write to a temporary file and atomically move it in place
+        tmp = "{}.{}.tmp".format(path, os.getpid())
+        count = 0
+        try:
+            with open(tmp, "wb") as f:
+                # the header is written once the number of records is known
+                f.seek(HEADER.size)
+
+                # records are sorted by their key, as it is a prefix
+                last = None
+                for entry in heapq.merge(*(self._read_run(run) for run in self.runs)):
+                    key = entry[:KEY_LENGTH]
+                    if key != last:
+                        f.write(key + entry[KEY_LENGTH + SEQUENCE.size :])
+                        last = key
+                        count += 1
+
+                f.write(self.group_table)
+
+                f.seek(0)
+                f.write(HEADER.pack(MAGIC, VERSION, 0, count, time.time_ns()))
+        finally:
+            for run in self.runs:
+                run.close()
+            self.runs = []
+        os.replace(tmp, path)
+
+        return count
+
+
+def write_index(path: str, rows: Iterable[Row]) -> int:
+    """Writes an index containing the given rows to path, replacing any
+    existing index atomically. Returns the number of records written."""
+
+    writer = IndexWriter()
+    for row in rows:
+        writer.add(row)
+    return writer.write(path)
+
+
+class GeoIndex(object):
+    """A read-only memory-mapped index"""
+
+    def __init__(self, path: str):
+        with open(path, "rb") as f:
+            self.stat = os.fstat(f.fileno())
+            self.mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        if len(self.mm) < HEADER.size:
+            raise GeoIndexError("Index is truncated")
+
+        magic, version, _, self.count, self.created = HEADER.unpack_from(self.mm, 0)
+        if magic != MAGIC or version != VERSION:
+            raise GeoIndexError("Index has an unknown format")
+
+        self.groups_offset = HEADER.size + self.count * RECORD.size
+        if len(self.mm) < self.groups_offset:
+            raise GeoIndexError("Index is truncated")
+
+    def _key_at(self, i: int) -> bytes:
+        offset = HEADER.size + i * RECORD.size
+        return self.mm[offset : offset + KEY_LENGTH]
+
+    def lookup(self, country: str, zip: str) -> Optional[Row]:
+        """Finds the row of a (country, normalized zip) pair, if any"""
+
+        key = _make_key(country, zip)
+        if key is None:
+            return None
+
+        # binary search for the key
+        lo, hi = 0, self.count
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self._key_at(mid) < key:
+                lo = mid + 1
+            else:
+                hi = mid
+        if lo >= self.count or self._key_at(lo) != key:
+            return None
+
+        _, lat, lon, offset, length = RECORD.unpack_from(
+            self.mm, HEADER.size + lo * RECORD.size
+        )
+        start = self.groups_offset + offset
+        group1, group2, group3 = (
+            self.mm[start : start + length].decode("utf-8").split("\t")
+        )
+        return country, zip, group1, group2, group3, lat, lon
+
+    def is_current(self, stat: os.stat_result) -> bool:
+        """Checks if this index is still the one at the given stat"""
+        return (self.stat.st_ino, self.stat.st_mtime_ns, self.stat.st_size) == (
+            stat.st_ino,
+            stat.st_mtime_ns,
+            stat.st_size,
+        )
+
+
+_index: Optional[GeoIndex] = None
+_lock = threading.Lock()
+
+
+def get_index() -> Optional[GeoIndex]:
+    """Returns the current index, or None if there is no index.
+    Re-opens the index when it has been replaced on disk."""
+    global _index
+
+    path = getattr(settings, "GEOLOCATION_INDEX", None)
+    if not path:
+        return None
+
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+
+    index = _index
+    if index is not None and index.is_current(stat):
+        return index
+
+    with _lock:
+        if _index is None or not _index.is_current(stat):
+            try:
+                _index = GeoIndex(path)
+            except (OSError, ValueError, GeoIndexError):
+                _index = None
+        return _index
@@ -0,0 +1,197 @@
+"""Streaming parser for the postal code export of geonames.org.
+
+The export is a tab-separated file with one postal code per line. Lines
+are parsed one at a time, hence the memory used by an import does not
+depend on the size of the file.
+
+Uncompressed files can also be parsed in parallel: the file is split into
+byte ranges, which are parsed by a pool of worker processes.
+"""
+
+from __future__ import annotations
+
+import collections
+import io
+import os
+import shutil
+import zipfile
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+
+import django
+
+from atlas.models import GeoCentroid, GeoLocation
+
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from typing import IO, Dict, Iterable, Iterator, List, Optional, Tuple, Union
+
+    # (country, zip, group1, group2, group3, lat, lon)
+    Row = Tuple[str, str, str, str, str, float, float]
+
+# name of the data file inside the zipped export
+ARCHIVE_MEMBER = "allCountries.txt"
+
+# size (in bytes) of the ranges parsed by a single worker task
+CHUNK_SIZE = 4 * 1024 * 1024
+
+# number of tasks queued per worker process
+TASKS_PER_WORKER = 2
+
+
+def parse_row(line: Union[str, bytes]) -> Optional[Row]:
+    """Parses a single line of the export into a row.
+    Returns None if the line is malformed."""
+
+    if isinstance(line, bytes):
+        try:
+            line = line.decode("utf-8")
+        except UnicodeDecodeError:
+            return None
+
+    fields = line.rstrip("\r\n").split("\t")
+    try:
+        country = fields[0]
+        zip = GeoLocation.normalize_zip(fields[1], country)
+
+        group1 = fields[4]
+        group2 = fields[6]
+        group3 = fields[8]
+
+        lat = float(fields[9])
+        lon = float(fields[10])
+    except (IndexError, ValueError):
+        return None
+
+    return country, zip, group1, group2, group3, lat, lon
+
+
+def _from_row(row: Row) -> GeoLocation:
+    country, zip, group1, group2, group3, lat, lon = row
+    return GeoLocation(
+        country=country,
+        zip=zip,
+        lat=lat,
+        lon=lon,
+        group1=group1,
+        group2=group2,
+        group3=group3,
+    )
+
+
+def parse_line(line: Union[str, bytes]) -> Optional[GeoLocation]:
+    """Parses a single line of the export into an unsaved GeoLocation.
+    Returns None if the line is malformed."""
+
+    row = parse_row(line)
+    if row is None:
+        return None
+    return _from_row(row)
+
+
+def _deduplicate(rows: Iterable[Optional[Row]]) -> Iterator[GeoLocation]:
+    """Turns rows into GeoLocations, skipping malformed rows and consecutive
+    duplicates of a (country, zip) pair. Other duplicates are only dropped
+    when inserting into the database."""
+
+    last = None
+    for row in rows:
+        if row is None:
+            continue
+
+        key = row[:2]
+        if key == last:
+            continue
+        last = key
+
+        yield _from_row(row)
+
+
+def parse(lines: Iterable[Union[str, bytes]]) -> Iterator[GeoLocation]:
+    """Parses the lines of the export into unsaved GeoLocations"""
+
+    return _deduplicate(parse_row(line) for line in lines)
+
+
+def parse_range(path: str, start: int, end: int) -> List[Row]:
+    """Parses the lines of a file starting within the byte range [start, end)"""
+
+    rows = []
+    with open(path, "rb") as f:
+        # skip the line started in a previous range
+        if start > 0:
+            f.seek(start - 1)
+            f.readline()
+
+        while f.tell() < end:
+            line = f.readline()
+            if not line:
+                break
+
+            row = parse_row(line)
+            if row is not None:
+                rows.append(row)
+    return rows
+
+
+def parse_parallel(
+    path: str, jobs: int, chunk_size: int = CHUNK_SIZE
+) -> Iterator[GeoLocation]:
+    """Parses an uncompressed export into unsaved GeoLocations using jobs
+    worker processes. Locations are returned in the order of the file, and
+    only a bounded number of ranges is parsed ahead of the consumer."""
+
+    size = os.path.getsize(path)
+
+    with ProcessPoolExecutor(max_workers=jobs, initializer=django.setup) as executor:
+
+        def rows() -> Iterator[Row]:
+            pending = collections.deque()
+            for start in range(0, size, chunk_size):
+                pending.append(
+                    executor.submit(parse_range, path, start, start + chunk_size)
+                )
+                if len(pending) >= jobs * TASKS_PER_WORKER:
+                    yield from pending.popleft().result()
+            while pending:
+                yield from pending.popleft().result()
+
+        yield from _deduplicate(rows())
+
+
+class CentroidSums(object):
+    """Accumulates the centroids of all administrative divisions of the
+    locations added to it, without storing the locations themselves"""
+
+    def __init__(self):
+        self.sums: Dict[Tuple[str, ...], Tuple[float, float, int]] = {}
+
+    def add(self, location: GeoLocation) -> None:
+        key = location._reduced_accuracy_key()
+        for level in range(2, len(key) + 1):
+            sum_lat, sum_lon, count = self.sums.get(key[:level], (0.0, 0.0, 0))
+            self.sums[key[:level]] = (
+                sum_lat + location.lat,
+                sum_lon + location.lon,
+                count + 1,
+            )
+
+    def centroids(self) -> Iterator[GeoCentroid]:
+        for key, (sum_lat, sum_lon, count) in self.sums.items():
+            yield GeoCentroid.from_key(key, sum_lat / count, sum_lon / count)
+
+
+@contextmanager
+def open_archive(f: IO[bytes]) -> Iterator[IO[str]]:
+    """Opens the data file inside a zipped export for reading line by line"""
+    with zipfile.ZipFile(f) as archive:
+        with archive.open(ARCHIVE_MEMBER, "r") as member:
+            yield io.TextIOWrapper(member, encoding="utf-8")
+
+
+def extract_archive(f: IO[bytes], dest: IO[bytes]) -> None:
+    """Extracts the data file inside a zipped export into dest"""
+    with zipfile.ZipFile(f) as archive:
+        with archive.open(ARCHIVE_MEMBER, "r") as member:
+            shutil.copyfileobj(member, dest, CHUNK_SIZE)
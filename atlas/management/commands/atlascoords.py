@@ -0,0 +1,18 @@
+from __future__ import annotations
+
+from django.core.management.base import BaseCommand
+
+from atlas.models import MemberLocation
+
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from typing import Any
+
+
+class Command(BaseCommand):
+    help = "Rebuilds the cached member coordinates shown on the atlas"
+
+    def handle(self, *args: Any, **kwargs: Any) -> None:
+        MemberLocation.rebuild()
+        print("Cached {} member location(s). ".format(MemberLocation.objects.count()))
@@ -1,27 +1,33 @@
 from __future__ import annotations
 
-import io
+import os
 import sys
+import tempfile
 import time
 import zipfile
 
 import requests
-from urllib.request import urlopen
-from django.core.management.base import BaseCommand
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
 from tqdm import tqdm
 
-from atlas.models import GeoLocation
+from atlas import download, geoindex, geonames
+from alumni.models import Address
+from atlas.models import GeoCentroid, GeoLocation, MemberLocation
 
 from typing import TYPE_CHECKING
 
 if TYPE_CHECKING:
     from argparse import ArgumentParser
-    from typing import IO
+    from typing import IO, Iterable, Iterator, Optional
 
 # Using our own mirror to not abuse geonames.org bandwidth too much
 # DOWNLOAD_URL = "https://download.geonames.org/export/zip/allCountries.zip"
 DOWNLOAD_URL = "https://github.com/JacobsAlumni/geonames.org-mirror/releases/download/v2020.01/allCountries.zip"
 
+# size of the chunks the download is written in
+CHUNK_SIZE = 1024 * 1024
+
 
 class Command(BaseCommand):
     help = "Updates Address GeoLocation caches using export of geonames.org"
@@ -36,96 +42,224 @@ class Command(BaseCommand):
         parser.add_argument(
             "--url", default=DOWNLOAD_URL, help="URL to download zipped data from. "
         )
+        parser.add_argument(
+            "--force",
+            action="store_true",
+            help="Import the downloaded data even if it is unchanged since the last import. ",
+        )
+        parser.add_argument(
+            "--incremental",
+            action="store_true",
+            help="Only apply the differences to the existing data, instead of replacing it. ",
+        )
+        parser.add_argument(
+            "--referenced",
+            action="store_true",
+            help="Only store locations of zip codes referenced by an address. Other locations are kept in the index only. ",
+        )
+        parser.add_argument(
+            "--countries",
+            default=None,
+            help="Comma-separated list of country codes to restrict the import to. ",
+        )
+        parser.add_argument(
+            "--jobs",
+            type=int,
+            default=None,
+            help="Number of processes to parse data with. Defaults to the number of CPUs. ",
+        )
 
     def handle(self, *args, **options) -> None:
+        self.force = options["force"]
+        self.incremental = options["incremental"]
+        self.referenced = options["referenced"]
+        self.countries = None
+        if options["countries"]:
+            self.countries = set(
+                c.strip().upper() for c in options["countries"].split(",") if c.strip()
+            )
+        self.jobs = options["jobs"] or os.cpu_count() or 1
+        if self.jobs < 1:
+            raise CommandError("--jobs must be at least 1")
+
         fn = options["fn"]
         if not fn:
             self.handle_download(options["url"])
+        elif zipfile.is_zipfile(fn):
+            with open(fn, "rb") as f:
+                self.handle_archive(f)
         else:
-            with open(fn, "r") as f:
-                self.handle_file(f)
+            self.handle_path(fn)
 
     def handle_download(self, url: str) -> None:
-        now = time.time()
-
-        # download into memory
         print("Downloading from {}. ".format(url))
-        data = self._fetch_with_tqdm(url)
 
-        # open the archive
-        with zipfile.ZipFile(data) as archive:
-            return self.handle_file(archive.open("allCountries.txt", "r"))
+        # download into the cache, unless it is up to date
+        cache_dir = getattr(settings, "GEOCACHE_DOWNLOAD_DIR", None)
+        if cache_dir:
+            try:
+                path, _ = download.fetch(url, cache_dir)
+            except (OSError, requests.RequestException, download.DownloadError) as e:
+                raise CommandError("Download failed: {}".format(e))
 
-    def _fetch_with_tqdm(self, url: str) -> None:
-        """Fetchs a URL with requests and tqdm. Returns a BytesIO"""
+            # only skip data that has been imported successfully before
+            if download.is_imported(path) and not self.force:
+                print("Data at {} is unchanged, nothing to do. ".format(path))
+                return
 
-        # grab the total file size and create an appropriate bar
-        file_size = int(urlopen(url).info().get("Content-Length", -1))
-        pbar = tqdm(total=file_size, unit="B", unit_scale=True, desc="Downloading")
+            with open(path, "rb") as data:
+                self.handle_archive(data)
+            download.mark_imported(path)
+            return
 
-        # create a buffer and make the request
-        buffer = io.BytesIO()
-        req = requests.get(url, stream=True)
+        # download into a temporary file
+        with tempfile.TemporaryFile() as data:
+            self._fetch_with_tqdm(url, data)
 
-        # iterate over the data in chunk of 1024 bytes
-        for chunk in req.iter_content(chunk_size=1024):
-            if chunk:
-                buffer.write(chunk)
-                pbar.update(1024)
+            # open the archive
+            data.seek(0)
+            return self.handle_archive(data)
 
-        # close the bar and return the buffer
-        pbar.close()
-        return buffer
+    def handle_archive(self, f: IO[bytes]) -> None:
+        if self.jobs == 1:
+            with geonames.open_archive(f) as lines:
+                return self.handle_file(lines)
 
-    def handle_file(self, f: IO[str]) -> None:
-        # a new set of locations
-        data = []
-        contained = set()
+        # extract the archive, so that it can be parsed in parallel
+        with tempfile.NamedTemporaryFile(suffix=".txt") as data:
+            geonames.extract_archive(f, data)
+            data.flush()
+            return self.handle_path(data.name)
 
-        # get a list of objects to create
-        for line in tqdm(f.readlines(), desc="Parsing"):
-            # decode the line if
-            try:
-                line = line.decode("utf-8")
-            except:
-                pass
+    def handle_path(self, fn: str) -> None:
+        if self.jobs == 1:
+            with open(fn, "r", encoding="utf-8") as f:
+                return self.handle_file(f)
 
-            # split into fields
-            fields = line.split("\t")
+        print("Parsing with {} processes. ".format(self.jobs))
+        return self.handle_locations(
+            tqdm(
+                geonames.parse_parallel(fn, self.jobs),
+                desc="Parsing",
+                unit=" locations",
+            )
+        )
 
-            # get the important fields
-            try:
-                country = fields[0]
-                zip = GeoLocation.normalize_zip(fields[1], fields[0])
+    def _fetch_with_tqdm(self, url: str, f: IO[bytes]) -> None:
+        """Fetchs a URL with requests and tqdm, writing the content into f"""
 
-                group1 = fields[4]
-                group2 = fields[6]
-                group3 = fields[8]
+        # make the request and create an appropriate bar
+        req = requests.get(url, stream=True)
+        req.raise_for_status()
+        file_size = int(req.headers.get("Content-Length", -1))
+        pbar = tqdm(total=file_size, unit="B", unit_scale=True, desc="Downloading")
+
+        # iterate over the data in chunks
+        for chunk in req.iter_content(chunk_size=CHUNK_SIZE):
+            if chunk:
+                f.write(chunk)
+                pbar.update(len(chunk))
+
+        # close the bar
+        pbar.close()
+
+    def handle_file(self, f: Iterable[str]) -> None:
+        return self.handle_locations(
+            geonames.parse(tqdm(f, desc="Parsing", unit=" lines"))
+        )
 
-                lat = float(fields[9])
-                lon = float(fields[10])
-            except Exception as e:
-                continue
+    def handle_locations(self, locations: Iterable[GeoLocation]) -> None:
+        if self.countries is not None:
+            locations = (l for l in locations if l.country.code in self.countries)
 
-            if (country, zip) in contained:
-                continue
+        # when only storing referenced locations, keep everything else in the
+        # index (if any) and compute the centroids while parsing
+        writer = None
+        centroids = None
+        if self.referenced:
+            if settings.GEOLOCATION_INDEX:
+                writer = geoindex.IndexWriter()
             else:
-                contained.add((country, zip))
-
-            data.append(
-                GeoLocation(
-                    country=country,
-                    zip=zip,
-                    lat=lat,
-                    lon=lon,
-                    group1=group1,
-                    group2=group2,
-                    group3=group3,
+                self.stderr.write(
+                    "No GEOLOCATION_INDEX configured, new addresses will only be resolved by the next import. "
                 )
+            centroids = geonames.CentroidSums()
+            locations = self._referenced(locations, writer, centroids)
+
+        # insert the locations while parsing
+        print("Updating database ... ")
+        sys.stdout.flush()
+        now = time.time()
+        if self.incremental:
+            counts = GeoLocation.updateDataIncremental(locations)
+            print(
+                "inserted {}, updated {} and deleted {} locations in {} seconds. ".format(
+                    counts["inserted"],
+                    counts["updated"],
+                    counts["deleted"],
+                    time.time() - now,
+                )
+            )
+        else:
+            count = GeoLocation.updateData(locations)
+            print(
+                "stored {} locations in {} seconds. ".format(count, time.time() - now)
             )
 
-        print("Updating database ... ", end="")
+        if settings.GEOLOCATION_INDEX:
+            print("Writing index to {} ... ".format(settings.GEOLOCATION_INDEX), end="")
+            sys.stdout.flush()
+            now = time.time()
+            if writer is not None:
+                writer.write(settings.GEOLOCATION_INDEX)
+            else:
+                geoindex.write_index(
+                    settings.GEOLOCATION_INDEX, GeoLocation.index_rows()
+                )
+            print("done in {} seconds. ".format(time.time() - now))
+
+        print("Computing centroids ... ", end="")
         sys.stdout.flush()
         now = time.time()
-        GeoLocation.updateData(data)
+        if centroids is not None:
+            GeoCentroid.replace(centroids.centroids())
+        else:
+            GeoCentroid.rebuild()
         print("done in {} seconds. ".format(time.time() - now))
+
+        print("Rebuilding member locations ... ", end="")
+        sys.stdout.flush()
+        now = time.time()
+        MemberLocation.rebuild()
+        print("done in {} seconds. ".format(time.time() - now))
+
+    def _referenced(
+        self,
+        locations: Iterable[GeoLocation],
+        writer: Optional[geoindex.IndexWriter],
+        centroids: geonames.CentroidSums,
+    ) -> Iterator[GeoLocation]:
+        """Filters locations referenced by an Address, adding all locations to
+        the index writer and the centroids"""
+
+        referenced = set(
+            (country, GeoLocation.normalize_zip(zip, country))
+            for country, zip in Address.objects.values_list("country", "zip")
+        )
+
+        for location in locations:
+            centroids.add(location)
+            if writer is not None:
+                writer.add(
+                    (
+                        location.country.code,
+                        location.zip,
+                        location.group1,
+                        location.group2,
+                        location.group3,
+                        location.lat,
+                        location.lon,
+                    )
+                )
+            if (location.country.code, location.zip) in referenced:
+                yield location
@@ -0,0 +1,160 @@
+from __future__ import annotations
+
+import io
+import json
+import os
+import tempfile
+from contextlib import redirect_stderr, redirect_stdout
+
+from django.core import management
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test.utils import override_settings
+
+from atlas import benchmark, geonames
+from atlas.models import GeoLocation
+
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from argparse import ArgumentParser
+    from typing import Any, Dict
+
+
+class Command(BaseCommand):
+    help = "Benchmarks the geocache import using synthetic data. Runs against a fresh test database, use --settings to benchmark other database backends. "
+
+    def add_arguments(self, parser: ArgumentParser) -> None:
+        parser.add_argument(
+            "--lines",
+            type=int,
+            default=100000,
+            help="Number of lines of synthetic data to generate. ",
+        )
+        parser.add_argument(
+            "--seed", type=int, default=0, help="Seed for generating data. "
+        )
+        parser.add_argument(
+            "--jobs",
+            type=int,
+            default=None,
+            help="Number of processes to parse data with. Defaults to the number of CPUs. ",
+        )
+        parser.add_argument(
+            "--data",
+            default=None,
+            help="Use the given export instead of generating synthetic data. ",
+        )
+        parser.add_argument(
+            "--output",
+            default=None,
+            help="Write the results as json to the given file. ",
+        )
+
+    def handle(self, *args, **options) -> None:
+        jobs = options["jobs"] or os.cpu_count() or 1
+
+        with tempfile.TemporaryDirectory() as tmp:
+            path = options["data"]
+            if path is None:
+                path = os.path.join(tmp, "allCountries.txt")
+                with benchmark.Timer() as t, open(path, "w", encoding="utf-8") as f:
+                    benchmark.write_synthetic(f, options["lines"], options["seed"])
+                self.stdout.write(
+                    "Generated {} lines in {:.2f} seconds. ".format(
+                        options["lines"], t.seconds
+                    )
+                )
+
+            with open(path, "rb") as f:
+                lines = sum(1 for _ in f)
+
+            results: Dict[str, Any] = {
+                "lines": lines,
+                "jobs": jobs,
+                "vendor": connection.vendor,
+            }
+
+            results.update(self.bench_parse(path, lines, jobs))
+            with TestDatabase(tmp):
+                results.update(self.bench_load(path, tmp, jobs))
+            results["load_seconds"] = (
+                results["parse_and_load_seconds"] - results["parse_seconds"]
+            )
+            results["peak_rss"] = benchmark.peak_rss()
+
+        for key, value in results.items():
+            self.stdout.write(
+                "{:<32} {}".format(
+                    key, "{:.3f}".format(value) if isinstance(value, float) else value
+                )
+            )
+
+        if options["output"]:
+            with open(options["output"], "w") as f:
+                json.dump(results, f, indent=2)
+
+    def bench_parse(self, path: str, lines: int, jobs: int) -> Dict[str, Any]:
+        """Measures parsing speed, without touching the database"""
+
+        with benchmark.Timer() as serial, open(path, "r", encoding="utf-8") as f:
+            locations = sum(1 for _ in geonames.parse(f))
+        results = {
+            "locations": locations,
+            "parse_seconds": serial.seconds,
+            "parse_lines_per_second": lines / serial.seconds,
+            "parse_peak_rss": benchmark.peak_rss(),
+        }
+
+        if jobs > 1:
+            with benchmark.Timer() as parallel:
+                sum(1 for _ in geonames.parse_parallel(path, jobs))
+            results.update(
+                {
+                    "parallel_parse_seconds": parallel.seconds,
+                    "parallel_parse_lines_per_second": lines / parallel.seconds,
+                }
+            )
+        return results
+
+    def bench_load(self, path: str, tmp: str, jobs: int) -> Dict[str, Any]:
+        """Measures loading into the database, and the entire import"""
+
+        # parsing is measured separately, hence only the time spent loading
+        # is reported, while memory use is the one of a streaming import
+        with benchmark.Timer() as load, open(path, "r", encoding="utf-8") as f:
+            count = GeoLocation.updateData(geonames.parse(f))
+
+        with override_settings(
+            GEOLOCATION_INDEX=os.path.join(tmp, "geolocation.idx")
+        ), redirect_stdout(io.StringIO()), redirect_stderr(
+            io.StringIO()
+        ), benchmark.Timer() as total:
+            management.call_command("geocache", path, jobs=jobs, stderr=io.StringIO())
+
+        return {
+            "parse_and_load_seconds": load.seconds,
+            "stored_locations": count,
+            "end_to_end_seconds": total.seconds,
+        }
+
+
+class TestDatabase(object):
+    """Replaces the default database with a fresh test database"""
+
+    def __init__(self, tmp: str):
+        self.tmp = tmp
+
+    def __enter__(self) -> None:
+        # use a file for SQLite, as the default in-memory database is not
+        # representative
+        if connection.vendor == "sqlite":
+            connection.settings_dict["TEST"]["NAME"] = os.path.join(
+                self.tmp, "benchmark.sqlite3"
+            )
+
+        self.old_name = connection.settings_dict["NAME"]
+        connection.creation.create_test_db(verbosity=0, autoclobber=True)
+
+    def __exit__(self, *args) -> None:
+        connection.creation.destroy_test_db(self.old_name, verbosity=0)
@@ -0,0 +1,32 @@
+# Generated by Django 4.2.30 on 2026-10-18 18:15
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("alumni", "0022_jacobsdata_transferoptout"),
+        ("atlas", "0004_atlassettings_reducedaccuracy"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="MemberLocation",
+            fields=[
+                (
+                    "member",
+                    models.OneToOneField(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        primary_key=True,
+                        related_name="location",
+                        serialize=False,
+                        to="alumni.alumni",
+                    ),
+                ),
+                ("lat", models.FloatField()),
+                ("lon", models.FloatField()),
+            ],
+        ),
+    ]
@@ -0,0 +1,59 @@
+# Generated by Django 4.2.30 on 2026-10-18 18:17
+
+import alumni.fields.country
+from django.db import migrations, models
+
+
+def compute_centroids(apps, schema_editor):
+    """Computes centroids from the existing GeoLocation table"""
+    GeoLocation = apps.get_model("atlas", "GeoLocation")
+    GeoCentroid = apps.get_model("atlas", "GeoCentroid")
+
+    groups = ["group1", "group2", "group3"]
+    for level in range(1, len(groups) + 1):
+        divisions = GeoLocation.objects
+        for group in groups[:level]:
+            divisions = divisions.exclude(**{group: ""})
+        divisions = (
+            divisions.values("country", *groups[:level])
+            .annotate(lat=models.Avg("lat"), lon=models.Avg("lon"))
+            .order_by()
+        )
+        GeoCentroid.objects.bulk_create(
+            [GeoCentroid(**division) for division in divisions.iterator()],
+            batch_size=1000,
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("atlas", "0005_memberlocation"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="GeoCentroid",
+            fields=[
+                (
+                    "id",
+                    models.AutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("country", alumni.fields.country.CountryField(max_length=2)),
+                ("group1", models.TextField()),
+                ("group2", models.TextField(blank=True)),
+                ("group3", models.TextField(blank=True)),
+                ("lat", models.FloatField()),
+                ("lon", models.FloatField()),
+            ],
+            options={
+                "unique_together": {("country", "group1", "group2", "group3")},
+            },
+        ),
+        migrations.RunPython(compute_centroids, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.2.30 on 2026-10-18 18:17
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("atlas", "0006_geocentroid"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="memberlocation",
+            name="updated",
+            field=models.DateTimeField(auto_now=True),
+        ),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 4.2.30 on 2026-10-18 18:19
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("atlas", "0007_memberlocation_updated"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="memberlocation",
+            index=models.Index(
+                fields=["lat", "lon"], name="atlas_membe_lat_a6b52a_idx"
+            ),
+        ),
+    ]
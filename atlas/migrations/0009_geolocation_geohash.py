@@ -0,0 +1,22 @@
+# Generated by Django 4.2.30 on 2026-10-18 18:23
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("atlas", "0008_memberlocation_index"),
+    ]
+
+    # the geohashes of existing locations used to be computed here, but the
+    # column is removed again by 0011_remove_geolocation_geohash
+    operations = [
+        migrations.AddField(
+            model_name="geolocation",
+            name="geohash",
+            field=models.CharField(
+                blank=True, db_index=True, default="", max_length=12
+            ),
+        ),
+    ]
@@ -0,0 +1,118 @@
+# Generated by Django 4.2.30 on 2026-10-18 18:37
+
+from django.db import migrations, models, OperationalError
+import django.db.models.deletion
+
+FTS_TABLE = "atlas_searchdocument_fts"
+GIN_INDEX = "atlas_searchdocument_text_gin"
+
+FIELDS = [
+    "givenName",
+    "familyName",
+    "address__city",
+    "jacobs__degree",
+    "skills__otherDegrees",
+    "skills__spokenLanguages",
+    "skills__programmingLanguages",
+    "skills__areasOfInterest",
+    "job__employer",
+    "job__position",
+    "atlas__secret",
+]
+
+
+def create_fulltext_index(apps, schema_editor):
+    """Creates the full-text index, if supported by the database"""
+
+    vendor = schema_editor.connection.vendor
+    if vendor == "sqlite":
+        try:
+            schema_editor.execute(
+                "CREATE VIRTUAL TABLE {0} USING fts5("
+                "text, content='atlas_searchdocument', content_rowid='member_id', "
+                "tokenize='unicode61 remove_diacritics 2')".format(FTS_TABLE)
+            )
+        except OperationalError:
+            # SQLite was compiled without FTS5
+            return
+
+        # keep the index in sync with the documents
+        schema_editor.execute(
+            "CREATE TRIGGER {0}_insert AFTER INSERT ON atlas_searchdocument BEGIN "
+            "INSERT INTO {0}(rowid, text) VALUES (new.member_id, new.text); "
+            "END".format(FTS_TABLE)
+        )
+        schema_editor.execute(
+            "CREATE TRIGGER {0}_delete AFTER DELETE ON atlas_searchdocument BEGIN "
+            "INSERT INTO {0}({0}, rowid, text) VALUES ('delete', old.member_id, old.text); "
+            "END".format(FTS_TABLE)
+        )
+        schema_editor.execute(
+            "CREATE TRIGGER {0}_update AFTER UPDATE ON atlas_searchdocument BEGIN "
+            "INSERT INTO {0}({0}, rowid, text) VALUES ('delete', old.member_id, old.text); "
+            "INSERT INTO {0}(rowid, text) VALUES (new.member_id, new.text); "
+            "END".format(FTS_TABLE)
+        )
+    elif vendor == "postgresql":
+        schema_editor.execute(
+            "CREATE INDEX {} ON atlas_searchdocument "
+            "USING GIN (to_tsvector('simple', text))".format(GIN_INDEX)
+        )
+
+
+def drop_fulltext_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == "sqlite":
+        for trigger in ["insert", "delete", "update"]:
+            schema_editor.execute(
+                "DROP TRIGGER IF EXISTS {}_{}".format(FTS_TABLE, trigger)
+            )
+        schema_editor.execute("DROP TABLE IF EXISTS {}".format(FTS_TABLE))
+    elif vendor == "postgresql":
+        schema_editor.execute("DROP INDEX IF EXISTS {}".format(GIN_INDEX))
+
+
+def compute_documents(apps, schema_editor):
+    """Computes the search documents of all existing members"""
+    Alumni = apps.get_model("alumni", "Alumni")
+    SearchDocument = apps.get_model("atlas", "SearchDocument")
+
+    SearchDocument.objects.bulk_create(
+        (
+            SearchDocument(
+                member_id=pk,
+                text="\n".join(str(v) for v in values if v not in (None, "")),
+            )
+            for pk, *values in Alumni.objects.values_list("pk", *FIELDS).iterator()
+        ),
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("alumni", "0022_jacobsdata_transferoptout"),
+        ("atlas", "0009_geolocation_geohash"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="SearchDocument",
+            fields=[
+                (
+                    "member",
+                    models.OneToOneField(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        primary_key=True,
+                        related_name="search_document",
+                        serialize=False,
+                        to="alumni.alumni",
+                    ),
+                ),
+                ("text", models.TextField(blank=True)),
+            ],
+        ),
+        migrations.RunPython(create_fulltext_index, drop_fulltext_index),
+        migrations.RunPython(compute_documents, migrations.RunPython.noop),
+    ]
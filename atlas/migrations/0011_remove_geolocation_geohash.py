@@ -0,0 +1,17 @@
+# Generated by Django 4.2.30 on 2026-10-18 19:17
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("atlas", "0010_searchdocument"),
+    ]
+
+    operations = [
+        migrations.RemoveField(
+            model_name="geolocation",
+            name="geohash",
+        ),
+    ]
@@ -1,11 +1,16 @@
 from __future__ import annotations
 
+import functools
+import operator
 import warnings
 import re
+import uuid
 
-from django.db import models, transaction
+from django.apps.registry import Apps
+from django.db import connection, models, transaction
 
-from alumni.models import Alumni
+from alumni.models import Address, Alumni
+from atlas import bulkload, geoindex
 from alumni.fields import CountryField
 
 from registry.alumni import AlumniComponentMixin
@@ -13,9 +18,23 @@ from registry.alumni import AlumniComponentMixin
 from typing import TYPE_CHECKING
 
 if TYPE_CHECKING:
-    from typing import Optional, List, Dict, Any
+    from typing import Optional, List, Dict, Any, Iterable, Iterator, Tuple, Type, Union
+    from datetime import datetime
+    from django.db.backends.base.schema import BaseDatabaseSchemaEditor
+    from django.db.models import QuerySet
     from django_countries.fields import Country
 
+# patterns used to normalize zip codes
+ZIP_NON_ALNUM = re.compile(r"[^0-9a-z]")
+ZIP_NON_DIGIT = re.compile(r"[^0-9]")
+
+# number of GeoLocations inserted per query when updating the data
+UPDATE_BATCH_SIZE = 5000
+
+# number of GeoCentroids looked up per query, which keeps queries below the
+# maximum expression depth of SQLite
+CENTROID_BATCH_SIZE = 200
+
 
 @Alumni.register_component(5)
 class AtlasSettings(AlumniComponentMixin, models.Model):
@@ -67,30 +86,24 @@ class GeoLocation(models.Model):
     class Meta:
         unique_together = ("country", "zip")
 
-    def reduced_accuracy(self) -> GeoLocation:
+    def reduced_accuracy(self) -> Optional[Union[GeoLocation, GeoCentroid]]:
         """Returns an instance in roughly the same location, but with reduced accuracy"""
-        if self.group1 and self.group2 and self.group3:
-            return GeoLocation.objects.filter(
-                country=self.country,
-                group1=self.group1,
-                group2=self.group2,
-                group3=self.group3,
-            ).first()
-        if self.group1 and self.group2:
-            return GeoLocation.objects.filter(
-                country=self.country, group1=self.group1, group2=self.group2
-            ).first()
-        if self.group1:
-            return GeoLocation.objects.filter(
-                country=self.country, group1=self.group1
-            ).first()
-        else:
+        key = self._reduced_accuracy_key()
+        if len(key) == 1:
+            # without any administrative division, we can't do better
             return self
+        return self._reduced_accuracy_many([self]).get(key)
 
     @classmethod
     def getLocInstance(
         cls, country: Optional[str], zip: Optional[str]
     ) -> Optional[GeoLocation]:
+        index = geoindex.get_index()
+        if index is not None:
+            code = getattr(country, "code", country)
+            row = index.lookup(code, cls.normalize_zip(zip, code) or "")
+            return cls.from_row(row) if row is not None else None
+
         try:
             return cls.objects.get(
                 country=country, zip=cls.normalize_zip(zip, country.code)
@@ -100,22 +113,276 @@ class GeoLocation(models.Model):
             #    country.code, cls.normalize_zip(zip, country.code)))
             return None
 
+    @classmethod
+    def from_row(cls, row: geoindex.Row) -> GeoLocation:
+        """Creates an (unsaved) instance from a row of the on-disk index"""
+        country, zip, group1, group2, group3, lat, lon = row
+        return cls(
+            country=country,
+            zip=zip,
+            group1=group1,
+            group2=group2,
+            group3=group3,
+            lat=lat,
+            lon=lon,
+        )
+
+    @classmethod
+    def materialize(cls, country: Optional[str], zip: Optional[str]) -> None:
+        """Stores the location of a (country, zip) pair from the on-disk index
+        in the database, unless it is stored already."""
+
+        index = geoindex.get_index()
+        country = getattr(country, "code", country)
+        if index is None or not country or zip is None:
+            return
+
+        zip = cls.normalize_zip(zip, country)
+        if cls.objects.filter(country=country, zip=zip).exists():
+            return
+
+        row = index.lookup(country, zip)
+        if row is not None:
+            cls.objects.bulk_create([cls.from_row(row)], ignore_conflicts=True)
+
+    @classmethod
+    def index_rows(cls) -> Iterable[geoindex.Row]:
+        """Returns all rows to be written to the on-disk index, by key"""
+        return (
+            cls.objects.order_by("country", "zip")
+            .values_list("country", "zip", "group1", "group2", "group3", "lat", "lon")
+            .iterator()
+        )
+
     @classmethod
     def getLoc(
         cls, country: Optional[str], zip: Optional[str], reduced_accuracy: bool = True
     ) -> Union[Tuple[float, float], Tuple[None, None]]:
-        instance = cls.getLocInstance(country, zip)
-        if instance is None:
-            return None, None
-        if reduced_accuracy:
-            instance = instance.reduced_accuracy()
-        return instance.lat, instance.lon
+        [coords] = cls.getLocMany([(country, zip, reduced_accuracy)])
+        return coords
 
     @classmethod
-    def updateData(cls, data: List[Dict[str, Any]]):
-        with transaction.atomic():
+    def getLocMany(
+        cls, locations: Iterable[Tuple[Optional[Country], Optional[str], bool]]
+    ) -> List[Union[Tuple[float, float], Tuple[None, None]]]:
+        """Resolves many (country, zip, reduced_accuracy) tuples at once.
+        Returns a list of coordinates in the same order as the input, using a
+        constant number of queries independent of the number of locations.
+
+        When the on-disk index written by geocache is available, it is used
+        instead of querying the GeoLocation table."""
+
+        locations = [
+            (getattr(country, "code", country), zip, reduced_accuracy)
+            for (country, zip, reduced_accuracy) in locations
+        ]
+        keys = [
+            (country, cls.normalize_zip(zip, country)) if country else (None, None)
+            for (country, zip, _) in locations
+        ]
+
+        # group the zips by country to lookup everything in a single query
+        zips_by_country: Dict[str, set] = {}
+        for code, normalized in keys:
+            if code is None or normalized is None:
+                continue
+            zips_by_country.setdefault(code, set()).add(normalized)
+
+        instances: Dict[Tuple[str, str], GeoLocation] = {}
+
+        # when there is an on-disk index, use it instead of the database
+        index = geoindex.get_index()
+        if index is not None:
+            for code, zips in zips_by_country.items():
+                for normalized in zips:
+                    row = index.lookup(code, normalized)
+                    if row is not None:
+                        instances[(code, normalized)] = cls.from_row(row)
+        elif len(zips_by_country) > 0:
+            query = functools.reduce(
+                operator.or_,
+                (
+                    models.Q(country=country, zip__in=zips)
+                    for (country, zips) in zips_by_country.items()
+                ),
+            )
+            for instance in cls.objects.filter(query):
+                instances[(instance.country.code, instance.zip)] = instance
+
+        # resolve reduced accuracy for those instances that need it
+        reduced = cls._reduced_accuracy_many(
+            instances[key]
+            for key, (_, _, reduced_accuracy) in zip(keys, locations)
+            if reduced_accuracy and key in instances
+        )
+
+        coords = []
+        for key, (_, _, reduced_accuracy) in zip(keys, locations):
+            instance = instances.get(key)
+            if instance is None:
+                coords.append((None, None))
+                continue
+            reduced_key = instance._reduced_accuracy_key()
+            if reduced_accuracy and len(reduced_key) > 1:
+                # never fall back to the exact location for privacy reasons
+                instance = reduced.get(reduced_key)
+                if instance is None:
+                    coords.append((None, None))
+                    continue
+            coords.append((instance.lat, instance.lon))
+        return coords
+
+    def _reduced_accuracy_key(self) -> Tuple[str, ...]:
+        """Returns the (country, group...) key used to reduce accuracy of this instance"""
+        groups = [self.group1, self.group2, self.group3]
+        while groups and not all(groups):
+            groups.pop()
+        return (self.country.code, *groups)
+
+    @classmethod
+    def _reduced_accuracy_many(
+        cls, instances: Iterable[GeoLocation]
+    ) -> Dict[Tuple[str, ...], GeoCentroid]:
+        """Like reduced_accuracy, but for many instances at once.
+        Returns a dictionary from _reduced_accuracy_key to centroids.
+        Keys for which no centroid is known are omitted, as are instances
+        without any administrative division, which have no centroid."""
+
+        reduced: Dict[Tuple[str, ...], GeoCentroid] = {}
+        keys = set(
+            key
+            for key in (instance._reduced_accuracy_key() for instance in instances)
+            if len(key) > 1
+        )
+
+        if len(keys) == 0:
+            return reduced
+
+        for batch in bulkload.batched(sorted(keys), CENTROID_BATCH_SIZE):
+            query = functools.reduce(
+                operator.or_, (GeoCentroid.key_query(key) for key in batch)
+            )
+            for centroid in GeoCentroid.objects.filter(query):
+                reduced[centroid.key()] = centroid
+        return reduced
+
+    @classmethod
+    def updateData(
+        cls, data: Iterable[GeoLocation], batch_size: int = UPDATE_BATCH_SIZE
+    ) -> int:
+        """Replaces all GeoLocations with the given ones.
+        Of several locations with the same (country, zip) only the first one
+        is kept. Returns the number of locations stored.
+
+        The locations are loaded into a shadow table in batches, which is
+        indexed and then swapped in place of the GeoLocation table by
+        renaming both tables in a single transaction. Hence readers never
+        see an empty table, and are not blocked while loading."""
+
+        # SQLite can't change the schema inside of a transaction, replace the
+        # rows in place instead. Other connections only see them on commit.
+        if connection.vendor == "sqlite" and connection.in_atomic_block:
             cls.objects.all().delete()
-            cls.objects.bulk_create(data)
+            bulkload.insert(cls, data, batch_size)
+            return cls.objects.count()
+
+        shadow, indexed = _copy_model("shadow")
+        table = cls._meta.db_table
+        old = "{}_old".format(shadow._meta.db_table)
+
+        with connection.schema_editor() as editor:
+            editor.create_model(shadow)
+        try:
+            bulkload.insert(
+                shadow, (shadow(**_copy_values(l)) for l in data), batch_size
+            )
+            with connection.schema_editor() as editor:
+                _create_field_indexes(editor, shadow, indexed)
+
+            # swap the tables
+            with connection.schema_editor() as editor:
+                editor.alter_db_table(cls, table, old)
+                editor.alter_db_table(shadow, shadow._meta.db_table, table)
+        except BaseException:
+            with connection.schema_editor() as editor:
+                editor.delete_model(shadow)
+            raise
+
+        # drop the previous table
+        with connection.schema_editor() as editor:
+            editor.execute(editor.sql_delete_table % {"table": editor.quote_name(old)})
+
+        return cls.objects.count()
+
+    @classmethod
+    def updateDataIncremental(
+        cls, data: Iterable[GeoLocation], batch_size: int = UPDATE_BATCH_SIZE
+    ) -> Dict[str, int]:
+        """Like updateData, but only applies the differences between the given
+        locations and the stored ones, compared by (country, zip).
+
+        The given locations are loaded into a temporary staging table first,
+        so that the differences can be computed inside the database.
+        Returns the number of inserted, updated and deleted locations."""
+
+        staging, _ = _copy_model("staging")
+        with connection.schema_editor() as editor:
+            editor.create_model(staging)
+
+        try:
+            bulkload.insert(
+                staging, (staging(**_copy_values(l)) for l in data), batch_size
+            )
+            with transaction.atomic():
+                return cls._apply_staging(staging, batch_size)
+        finally:
+            with connection.schema_editor() as editor:
+                editor.delete_model(staging)
+
+    @classmethod
+    def _apply_staging(
+        cls, staging: Type[models.Model], batch_size: int
+    ) -> Dict[str, int]:
+        same_key = {f: models.OuterRef(f) for f in KEY_FIELDS}
+        unchanged = functools.reduce(
+            operator.and_, (models.Q(**{f: models.OuterRef(f)}) for f in DATA_FIELDS)
+        )
+
+        # delete locations that no longer exist
+        deleted, _ = cls.objects.filter(
+            ~models.Exists(staging.objects.filter(**same_key))
+        ).delete()
+
+        # update locations that have changed
+        existing = cls.objects.filter(**same_key)
+        changed = (
+            staging.objects.filter(models.Exists(existing))
+            .exclude(models.Exists(existing.filter(unchanged)))
+            .annotate(target=models.Subquery(existing.values("pk")[:1]))
+            .values_list("target", *DATA_FIELDS)
+        )
+        updated = 0
+        for batch in bulkload.batched(
+            changed.iterator(chunk_size=batch_size), batch_size
+        ):
+            cls.objects.bulk_update(
+                [cls(pk=row[0], **dict(zip(DATA_FIELDS, row[1:]))) for row in batch],
+                DATA_FIELDS,
+            )
+            updated += len(batch)
+
+        # insert new locations
+        fields = KEY_FIELDS + DATA_FIELDS
+        added = (
+            staging.objects.filter(~models.Exists(existing))
+            .values_list(*fields)
+            .iterator(chunk_size=batch_size)
+        )
+        inserted = bulkload.insert(
+            cls, (cls(**dict(zip(fields, row))) for row in added), batch_size
+        )
+
+        return {"inserted": inserted, "updated": updated, "deleted": deleted}
 
     @classmethod
     def normalize_zip(
@@ -127,7 +394,7 @@ class GeoLocation(models.Model):
             return None
 
         lowerzip = zip.lower()
-        norm = re.sub(r"[^0-9a-z]", "", lowerzip)
+        norm = ZIP_NON_ALNUM.sub("", lowerzip)
 
         # Canada: First three characters
         if country == "CA":
@@ -137,8 +404,309 @@ class GeoLocation(models.Model):
             norm = norm[0:4]
         # Netherlands: digits only
         elif country == "NL":
-            norm = re.sub(r"[^0-9]", "", norm)
+            norm = ZIP_NON_DIGIT.sub("", norm)
         return norm
 
     def __str__(self) -> str:
         return "GeoLocation of {} in {}".format(self.zip, self.country)
+
+
+# fields identifying a GeoLocation, and those compared by incremental updates
+KEY_FIELDS = ("country", "zip")
+DATA_FIELDS = ("group1", "group2", "group3", "lat", "lon")
+
+
+def _copy_model(kind: str) -> Tuple[Type[models.Model], List[models.Field]]:
+    """Creates a model for a uniquely named copy of the GeoLocation table.
+    The model is registered in an isolated registry.
+
+    Only the unique constraint is created along with the table, the indexed
+    fields of GeoLocation are returned to be indexed later on, see
+    _create_field_indexes."""
+
+    suffix = uuid.uuid4().hex[:12]
+
+    fields = {}
+    indexed = []
+    for f in GeoLocation._meta.concrete_fields:
+        if f.primary_key:
+            continue
+
+        field = f.clone()
+        if field.db_index:
+            field.db_index = False
+            indexed.append(f)
+        fields[f.name] = field
+
+    meta = type(
+        "Meta",
+        (),
+        {
+            "apps": Apps(),
+            "app_label": GeoLocation._meta.app_label,
+            "db_table": "{}_{}_{}".format(GeoLocation._meta.db_table, kind, suffix),
+            "unique_together": GeoLocation._meta.unique_together,
+        },
+    )
+    model = type(
+        "GeoLocation{}".format(kind.capitalize()),
+        (models.Model,),
+        {"__module__": __name__, "Meta": meta, **fields},
+    )
+    return model, indexed
+
+
+def _create_field_indexes(
+    editor: BaseDatabaseSchemaEditor,
+    model: Type[models.Model],
+    fields: List[models.Field],
+) -> None:
+    """Creates the indexes of fields on the table of model, exactly like the
+    schema editor does for a new table. This includes the additional
+    varchar_pattern_ops index of indexed CharFields on PostgreSQL."""
+
+    for field in fields:
+        for statement in editor._field_indexes_sql(model, field):
+            editor.execute(statement)
+
+
+def _copy_values(location: GeoLocation) -> Dict[str, Any]:
+    return {f: getattr(location, f) for f in KEY_FIELDS + DATA_FIELDS}
+
+
+class GeoCentroid(models.Model):
+    """The centroid of all GeoLocations within an administrative division.
+
+    Divisions are identified by a prefix of (group1, group2, group3), the
+    remaining groups are left empty.
+    """
+
+    GROUPS = ["group1", "group2", "group3"]
+
+    country: Country = CountryField()
+
+    group1: str = models.TextField()
+    group2: str = models.TextField(blank=True)
+    group3: str = models.TextField(blank=True)
+
+    lat: float = models.FloatField()
+    lon: float = models.FloatField()
+
+    class Meta:
+        unique_together = ("country", "group1", "group2", "group3")
+
+    def key(self) -> Tuple[str, ...]:
+        """Returns the (country, group...) key of this centroid"""
+        groups = [getattr(self, group) for group in self.GROUPS]
+        while groups and not groups[-1]:
+            groups.pop()
+        return (self.country.code, *groups)
+
+    @classmethod
+    def key_query(cls, key: Tuple[str, ...]) -> models.Q:
+        """Returns a query matching the centroid with the given key"""
+        country, *groups = key
+        groups += [""] * (len(cls.GROUPS) - len(groups))
+        return models.Q(country=country, **dict(zip(cls.GROUPS, groups)))
+
+    @classmethod
+    def from_key(cls, key: Tuple[str, ...], lat: float, lon: float) -> GeoCentroid:
+        """Creates an (unsaved) centroid with the given key"""
+        country, *groups = key
+        groups += [""] * (len(cls.GROUPS) - len(groups))
+        return cls(country=country, lat=lat, lon=lon, **dict(zip(cls.GROUPS, groups)))
+
+    @classmethod
+    def replace(cls, centroids: Iterable[GeoCentroid]) -> None:
+        """Replaces all centroids with the given ones"""
+
+        with transaction.atomic():
+            cls.objects.all().delete()
+            cls.objects.bulk_create(centroids, batch_size=1000)
+
+    @classmethod
+    def rebuild(cls) -> None:
+        """Recomputes all centroids from the GeoLocation table"""
+        cls.replace(
+            centroid
+            for level in range(1, len(cls.GROUPS) + 1)
+            for centroid in cls._aggregate(level)
+        )
+
+    @classmethod
+    def _aggregate(cls, level: int) -> Iterator[GeoCentroid]:
+        """Computes the centroids of all divisions with level groups"""
+
+        groups = cls.GROUPS[:level]
+        divisions = (
+            GeoLocation.objects.exclude(
+                functools.reduce(operator.or_, (models.Q(**{g: ""}) for g in groups))
+            )
+            .values("country", *groups)
+            .annotate(lat=models.Avg("lat"), lon=models.Avg("lon"))
+            .order_by()
+        )
+        for division in divisions.iterator():
+            yield cls(
+                country=division["country"],
+                lat=division["lat"],
+                lon=division["lon"],
+                **{g: division[g] for g in groups},
+            )
+
+    def __str__(self) -> str:
+        return "GeoCentroid of {} in {}".format(
+            " / ".join(self.key()[1:]), self.country
+        )
+
+
+class MemberLocation(models.Model):
+    """Materialized map coordinates of a member that is visible on the atlas.
+
+    Rows only exist for approved members that are included in the atlas and
+    whose address resolves to a location. Coordinates are already resolved
+    with respect to the reducedAccuracy setting of the member.
+    """
+
+    member: Alumni = models.OneToOneField(
+        Alumni, related_name="location", on_delete=models.CASCADE, primary_key=True
+    )
+
+    lat: float = models.FloatField()
+    lon: float = models.FloatField()
+
+    updated: datetime = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [models.Index(fields=["lat", "lon"])]
+
+    @classmethod
+    def visible_addresses(cls) -> QuerySet[Address]:
+        """Returns all addresses that should be shown on the atlas"""
+        return Address.objects.filter(
+            member__atlas__included=True, member__approval__approval=True
+        ).select_related("member__atlas")
+
+    @classmethod
+    def update_member(cls, member_id: int) -> None:
+        """Updates (or removes) the cached location of a single member"""
+
+        address = cls.visible_addresses().filter(member_id=member_id).first()
+        if address is not None:
+            GeoLocation.materialize(address.country, address.zip)
+        lat, lon = address.coords if address is not None else (None, None)
+
+        if lat is None or lon is None:
+            cls.objects.filter(member_id=member_id).delete()
+            return
+
+        cls.objects.update_or_create(
+            member_id=member_id, defaults={"lat": lat, "lon": lon}
+        )
+
+    @classmethod
+    def rebuild(cls) -> None:
+        """Recomputes the cached locations of all members"""
+
+        addresses = list(cls.visible_addresses())
+        coords = GeoLocation.getLocMany(
+            (address.country, address.zip, address.member.atlas.reducedAccuracy)
+            for address in addresses
+        )
+
+        locations = [
+            cls(member_id=address.member_id, lat=lat, lon=lon)
+            for (address, (lat, lon)) in zip(addresses, coords)
+            if lat is not None and lon is not None
+        ]
+
+        with transaction.atomic():
+            cls.objects.all().delete()
+            cls.objects.bulk_create(locations)
+
+    @classmethod
+    def all_coords(cls) -> Iterable[Tuple[float, float]]:
+        """Returns the coordinates of all members visible on the atlas"""
+        return cls.objects.values_list("lat", "lon")
+
+    @classmethod
+    def version(cls) -> Tuple[int, Optional[datetime]]:
+        """Returns a (count, last_updated) tuple that changes whenever the set
+        of member locations changes"""
+        version = cls.objects.aggregate(
+            count=models.Count("pk"), updated=models.Max("updated")
+        )
+        return version["count"], version["updated"]
+
+    def __str__(self) -> str:
+        return "Location of {}".format(self.member_id)
+
+
+class SearchDocument(models.Model):
+    """The denormalized text of a member used for full-text searches.
+
+    The table is indexed by an FTS5 table on SQLite and a GIN index on
+    PostgreSQL, see atlas.fulltext.
+    """
+
+    # fields of (and relative to) Alumni that are searched for plain text
+    FIELDS = [
+        "givenName",
+        "familyName",
+        "address__city",
+        "jacobs__degree",
+        "skills__otherDegrees",
+        "skills__spokenLanguages",
+        "skills__programmingLanguages",
+        "skills__areasOfInterest",
+        "job__employer",
+        "job__position",
+        "atlas__secret",
+    ]
+
+    member: Alumni = models.OneToOneField(
+        Alumni,
+        related_name="search_document",
+        on_delete=models.CASCADE,
+        primary_key=True,
+    )
+
+    text: str = models.TextField(blank=True)
+
+    @classmethod
+    def _documents(cls, members: QuerySet) -> Iterator[SearchDocument]:
+        for pk, *values in members.values_list("pk", *cls.FIELDS).iterator():
+            yield cls(
+                member_id=pk,
+                text="\n".join(str(v) for v in values if v not in (None, "")),
+            )
+
+    @classmethod
+    def update_member(cls, member_id: int, create: bool = True) -> None:
+        """Updates (or removes) the search document of a single member.
+        When create is False, a missing document is not created, e.g. while
+        the member is being deleted."""
+
+        for document in cls._documents(Alumni.objects.filter(pk=member_id)):
+            if create:
+                cls.objects.update_or_create(
+                    member_id=member_id, defaults={"text": document.text}
+                )
+            else:
+                cls.objects.filter(member_id=member_id).update(text=document.text)
+            return
+
+        cls.objects.filter(member_id=member_id).delete()
+
+    @classmethod
+    def rebuild(cls) -> None:
+        """Recomputes the search documents of all members"""
+
+        with transaction.atomic():
+            cls.objects.all().delete()
+            cls.objects.bulk_create(
+                cls._documents(Alumni.objects.all()), batch_size=1000
+            )
+
+    def __str__(self) -> str:
+        return "Search document of {}".format(self.member_id)
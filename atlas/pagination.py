@@ -0,0 +1,189 @@
+"""Pagination of search results without counting all of them.
+
+KeysetPaginator fetches a page by filtering on the ordering keys of the
+last (or first) row of the adjacent page, instead of using an OFFSET.
+Hence every page costs the same, no matter how deep, and the total
+number of results is never computed. Pages are referred to by opaque,
+signed cursors.
+
+CappedPaginator is a Paginator with numbered pages, which counts results
+only up to a limit, e.g. "1000+".
+"""
+
+from __future__ import annotations
+
+import functools
+import operator
+
+from django.core import signing
+from django.core.paginator import Paginator
+from django.db.models import Q
+from django.utils.functional import cached_property
+
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from typing import Any, Iterator, List, Optional, Sequence
+    from django.db.models import Model, QuerySet
+
+# salt used for signing cursors
+CURSOR_SALT = "atlas.pagination.cursor"
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+class CappedPaginator(Paginator):
+    """A Paginator counting at most limit objects, hence pages past the
+    limit are not available"""
+
+    def __init__(self, object_list: QuerySet, per_page: int, limit: int, **kwargs):
+        super().__init__(object_list, per_page, **kwargs)
+        self.limit = limit
+
+    @cached_property
+    def _capped_count(self) -> int:
+        # count within a subquery with a LIMIT, without the ordering and
+        # annotations of the results
+        return self.object_list.order_by().values("pk")[: self.limit + 1].count()
+
+    @cached_property
+    def count(self) -> int:
+        return min(self._capped_count, self.limit)
+
+    @property
+    def capped(self) -> bool:
+        """If there are more objects than counted"""
+        return self._capped_count > self.limit
+
+    @property
+    def total(self) -> str:
+        """The number of objects for display, e.g. '1000+'"""
+        return "{}+".format(self.limit) if self.capped else str(self.count)
+
+
+class KeysetPaginator(object):
+    """Paginates a queryset in ascending order of keys, which must be
+    unique together (e.g. end with the primary key)"""
+
+    # the total number of results is not known
+    count = None
+    num_pages = None
+
+    def __init__(self, queryset: QuerySet, per_page: int, keys: Sequence[str]):
+        self.queryset = queryset
+        self.per_page = per_page
+        self.keys = list(keys)
+
+    def encode_cursor(self, row: Model, forward: bool, number: int) -> str:
+        """Returns the cursor of the page after (or before) row"""
+        values = [getattr(row, key) for key in self.keys]
+        return signing.dumps([forward, values, number], salt=CURSOR_SALT)
+
+    def decode_cursor(self, cursor: str) -> List[Any]:
+        try:
+            forward, values, number = signing.loads(cursor, salt=CURSOR_SALT)
+        except (signing.BadSignature, TypeError, ValueError) as e:
+            raise InvalidCursor("Invalid cursor") from e
+        if len(values) != len(self.keys):
+            raise InvalidCursor("Invalid cursor")
+        return [forward, values, number]
+
+    def _beyond(self, values: List[Any], forward: bool) -> Q:
+        """Filters rows after (or before) the given values of the keys"""
+        lookup = "gt" if forward else "lt"
+
+        # (k1 > v1) or (k1 = v1 and k2 > v2) or ...
+        clauses = []
+        for i, key in enumerate(self.keys):
+            equal = {k: v for k, v in zip(self.keys[:i], values[:i])}
+            clauses.append(Q(**equal, **{"{}__{}".format(key, lookup): values[i]}))
+        return functools.reduce(operator.or_, clauses)
+
+    def page(self, cursor: Optional[str] = None) -> KeysetPage:
+        """Returns the page a cursor refers to, or the first page"""
+
+        queryset = self.queryset
+        forward, number = True, 1
+        if cursor:
+            forward, values, number = self.decode_cursor(cursor)
+            queryset = queryset.filter(self._beyond(values, forward))
+
+        ordering = self.keys if forward else ["-" + key for key in self.keys]
+
+        # fetch one more row to find out if there are further rows
+        rows = list(queryset.order_by(*ordering)[: self.per_page + 1])
+        more = len(rows) > self.per_page
+        rows = rows[: self.per_page]
+
+        if forward:
+            has_previous, has_next = cursor is not None, more
+        else:
+            rows.reverse()
+            has_previous, has_next = more, True
+
+        return KeysetPage(
+            rows,
+            number,
+            self,
+            has_next=has_next and len(rows) > 0,
+            has_previous=has_previous and number > 1,
+        )
+
+
+class KeysetPage(object):
+    """A page of a KeysetPaginator, mirroring the interface of Page"""
+
+    def __init__(
+        self,
+        object_list: List[Model],
+        number: int,
+        paginator: KeysetPaginator,
+        has_next: bool,
+        has_previous: bool,
+    ):
+        self.object_list = object_list
+        self.number = number
+        self.paginator = paginator
+        self._has_next = has_next
+        self._has_previous = has_previous
+
+    def __len__(self) -> int:
+        return len(self.object_list)
+
+    def __getitem__(self, index: int) -> Model:
+        return self.object_list[index]
+
+    def __iter__(self) -> Iterator[Model]:
+        return iter(self.object_list)
+
+    def __repr__(self) -> str:
+        return "<Page {} (keyset)>".format(self.number)
+
+    def has_next(self) -> bool:
+        return self._has_next
+
+    def has_previous(self) -> bool:
+        return self._has_previous
+
+    def has_other_pages(self) -> bool:
+        return self.has_next() or self.has_previous()
+
+    def next_page_number(self) -> int:
+        return self.number + 1
+
+    def previous_page_number(self) -> int:
+        return self.number - 1
+
+    @property
+    def next_cursor(self) -> Optional[str]:
+        if not self.has_next():
+            return None
+        return self.paginator.encode_cursor(self.object_list[-1], True, self.number + 1)
+
+    @property
+    def previous_cursor(self) -> Optional[str]:
+        if not self.has_previous():
+            return None
+        return self.paginator.encode_cursor(self.object_list[0], False, self.number - 1)
@@ -0,0 +1,45 @@
+from __future__ import annotations
+
+from django.dispatch import receiver
+from django.db.models import signals
+
+from alumni.models import Alumni
+from atlas.models import MemberLocation, SearchDocument
+
+
+@receiver(signals.post_save, sender="alumni.Address")
+@receiver(signals.post_delete, sender="alumni.Address")
+@receiver(signals.post_save, sender="alumni.Approval")
+@receiver(signals.post_delete, sender="alumni.Approval")
+@receiver(signals.post_save, sender="atlas.AtlasSettings")
+@receiver(signals.post_delete, sender="atlas.AtlasSettings")
+def _update_member_location(sender, instance, **kwargs):
+    """Keeps the cached location of a member in sync with their settings"""
+
+    if kwargs.get("raw", False):
+        return
+
+    MemberLocation.update_member(instance.member_id)
+
+
+@receiver(signals.post_save, sender="alumni.Alumni")
+@receiver(signals.post_save, sender="alumni.Address")
+@receiver(signals.post_delete, sender="alumni.Address")
+@receiver(signals.post_save, sender="alumni.JacobsData")
+@receiver(signals.post_delete, sender="alumni.JacobsData")
+@receiver(signals.post_save, sender="alumni.JobInformation")
+@receiver(signals.post_delete, sender="alumni.JobInformation")
+@receiver(signals.post_save, sender="alumni.Skills")
+@receiver(signals.post_delete, sender="alumni.Skills")
+@receiver(signals.post_save, sender="atlas.AtlasSettings")
+@receiver(signals.post_delete, sender="atlas.AtlasSettings")
+def _update_search_document(sender, instance, **kwargs):
+    """Keeps the search document of a member in sync with their profile"""
+
+    if kwargs.get("raw", False):
+        return
+
+    SearchDocument.update_member(
+        instance.pk if sender is Alumni else instance.member_id,
+        create=kwargs["signal"] is signals.post_save,
+    )
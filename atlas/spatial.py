@@ -0,0 +1,180 @@
+"""Proximity searches over the member locations of the atlas.
+
+Candidates are selected with a bounding box over the (lat, lon) index of
+MemberLocation, then filtered by their great-circle distance inside the
+database. Hence no query ever scans all member addresses.
+"""
+
+from __future__ import annotations
+
+import math
+import re
+
+from django.db.models import F, Q
+from django.db.models.functions import ASin, Cos, Power, Radians, Sin, Sqrt
+
+from atlas.models import GeoCentroid, MemberLocation
+
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from typing import Any, Optional, Tuple
+
+    # (south, west, north, east)
+    BBox = Tuple[float, float, float, float]
+
+EARTH_RADIUS_KM = 6371.0
+KM_PER_DEGREE = math.pi * EARTH_RADIUS_KM / 180.0
+
+# units understood in proximity searches
+UNITS = {"km": 1.0, "mi": 1.609344}
+
+# radius used when searching near a place without an explicit radius
+DEFAULT_RADIUS_KM = 25.0
+
+# maximal radius allowed in searches
+MAX_RADIUS_KM = 5000.0
+
+NEAR_PATTERN = re.compile(
+    r"^\s*(?:(?P<place>.*?)[\s,]+)?(?P<radius>\d+(?:\.\d+)?)\s*(?P<unit>km|mi)?\s*$",
+    re.IGNORECASE,
+)
+
+
+def parse_near(value: Any) -> Tuple[Optional[str], float]:
+    """Parses the value of a 'near' search into a (place, radius_km) pair.
+    Accepts e.g. 50, "50km", "20mi", "Berlin" or "Berlin 20km"."""
+
+    if isinstance(value, (int, float)):
+        place, radius = None, float(value)
+    else:
+        value = str(value).strip()
+        match = NEAR_PATTERN.match(value)
+        if match is None:
+            place, radius = value, DEFAULT_RADIUS_KM
+        else:
+            place = match.group("place") or None
+            unit = (match.group("unit") or "km").lower()
+            radius = float(match.group("radius")) * UNITS[unit]
+
+    if not radius > 0 or radius > MAX_RADIUS_KM:
+        raise ValueError(
+            "Radius must be between 0 and {} km".format(int(MAX_RADIUS_KM))
+        )
+    return place, radius
+
+
+def resolve_place(place: str) -> Tuple[float, float]:
+    """Resolves the name of a place into a (lat, lon) pair.
+
+    Uses the cities of member addresses first, and the names of
+    administrative divisions otherwise."""
+
+    members = MemberLocation.objects.filter(member__address__city__iexact=place)
+    coords = list(members.values_list("lat", "lon"))
+    if coords:
+        return (
+            sum(lat for lat, _ in coords) / len(coords),
+            sum(lon for _, lon in coords) / len(coords),
+        )
+
+    # find a division that is named exactly like the place
+    centroid = (
+        GeoCentroid.objects.filter(
+            Q(group1__iexact=place, group2="", group3="")
+            | Q(group2__iexact=place, group3="")
+            | Q(group3__iexact=place)
+        )
+        .order_by("pk")
+        .first()
+    )
+    if centroid is not None:
+        return centroid.lat, centroid.lon
+
+    raise ValueError("Unknown place: {}".format(place))
+
+
+def within_radius(lat: float, lon: float, radius_km: float) -> Q:
+    """Returns a query for the Alumni within radius_km of (lat, lon)"""
+
+    # bounding box around the point, used to prefilter via the index
+    dlat = radius_km / KM_PER_DEGREE
+    box = Q(lat__gte=lat - dlat, lat__lte=lat + dlat)
+
+    cos_lat = math.cos(math.radians(lat))
+    if cos_lat > 0 and radius_km / (KM_PER_DEGREE * cos_lat) < 180:
+        dlon = radius_km / (KM_PER_DEGREE * cos_lat)
+        west, east = lon - dlon, lon + dlon
+        if west < -180:
+            box &= Q(lon__gte=west + 360) | Q(lon__lte=east)
+        elif east > 180:
+            box &= Q(lon__gte=west) | Q(lon__lte=east - 360)
+        else:
+            box &= Q(lon__gte=west, lon__lte=east)
+
+    # great-circle distance using the haversine formula
+    distance = (
+        2
+        * EARTH_RADIUS_KM
+        * ASin(
+            Sqrt(
+                Power(Sin((Radians(F("lat")) - math.radians(lat)) / 2), 2)
+                + cos_lat
+                * Cos(Radians(F("lat")))
+                * Power(Sin((Radians(F("lon")) - math.radians(lon)) / 2), 2)
+            )
+        )
+    )
+
+    members = (
+        MemberLocation.objects.filter(box)
+        .annotate(distance=distance)
+        .filter(distance__lte=radius_km)
+        .values("member_id")
+    )
+    return Q(pk__in=members)
+
+
+def parse_bbox(value: str) -> BBox:
+    """Parses a 'south,west,north,east' bounding box.
+    When west > east the bounding box is assumed to cross the antimeridian."""
+
+    try:
+        bbox = tuple(float(c) for c in value.split(","))
+    except ValueError:
+        bbox = ()
+    if len(bbox) != 4 or not all(math.isfinite(c) for c in bbox):
+        raise ValueError("Expected 'bbox' to be 'south,west,north,east'")
+
+    south, west, north, east = bbox
+    if not -90 <= south <= north <= 90 or not (
+        -180 <= west <= 180 and -180 <= east <= 180
+    ):
+        raise ValueError("Bounding box is out of range")
+    return bbox
+
+
+def within_bbox(south: float, west: float, north: float, east: float) -> Q:
+    """Returns a query for the Alumni whose location is inside a bounding box.
+    Uses the (lat, lon) index of MemberLocation."""
+
+    box = Q(location__lat__gte=south, location__lat__lte=north)
+    if west <= east:
+        box &= Q(location__lon__gte=west, location__lon__lte=east)
+    else:
+        box &= Q(location__lon__gte=west) | Q(location__lon__lte=east)
+    return box
+
+
+def near_query(value: Any, origin: Optional[Tuple[float, float]]) -> Q:
+    """Implements the 'near' search operator"""
+
+    place, radius = parse_near(value)
+    if place is not None:
+        lat, lon = resolve_place(place)
+    elif origin is not None:
+        lat, lon = origin
+    else:
+        raise ValueError("Your location is unknown, search near a place instead")
+
+    return within_radius(lat, lon, radius)
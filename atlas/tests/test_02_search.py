@@ -10,12 +10,17 @@ from datetime import timezone, datetime
 from selenium.webdriver.common.by import By
 
 from MemberManagement.tests.integration import IntegrationTest
+from atlas.models import SearchDocument
 
 
 class SearchResultsTest(IntegrationTest, StaticLiveServerTestCase):
     fixtures = ["registry/tests/fixtures/integration.json"]
     user = "Mounfem"
 
+    def setUp(self) -> None:
+        super().setUp()
+        SearchDocument.rebuild()
+
     def _assert_search_results(self, query: str, names: List[str]) -> None:
         """Asserts that a given query results in the given results"""
         self.submit_form(
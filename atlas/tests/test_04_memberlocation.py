@@ -0,0 +1,129 @@
+from __future__ import annotations
+
+from django.test import TestCase
+
+from alumni.models import Alumni
+from atlas.models import GeoCentroid, GeoLocation, MemberLocation
+
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from typing import List
+
+
+class MemberLocationTest(TestCase):
+    fixtures = ["registry/tests/fixtures/integration.json"]
+
+    def setUp(self) -> None:
+        MemberLocation.rebuild()
+
+    def _coords(self) -> List[List[float]]:
+        return sorted([list(c) for c in MemberLocation.all_coords()])
+
+    def test_rebuild(self) -> None:
+        self.assertListEqual(
+            self._coords(),
+            sorted(
+                [
+                    [51.1181, 12.3907],
+                    [51.9716, 9.5193],
+                    [29.7992, -90.8096],
+                    [36.6916, -82.02],
+                    [53.1094, 8.7814],
+                    [46.7667, 23.6],
+                ]
+            ),
+            "check that rebuild caches the coordinates of all visible members",
+        )
+
+    def test_signal_atlas_settings(self) -> None:
+        alumni = Alumni.objects.get(profile__username="Mounfem")
+        self.assertTrue(MemberLocation.objects.filter(member=alumni).exists())
+
+        alumni.atlas.included = False
+        alumni.atlas.save()
+        self.assertFalse(MemberLocation.objects.filter(member=alumni).exists())
+
+        alumni.atlas.included = True
+        alumni.atlas.save()
+        self.assertTrue(MemberLocation.objects.filter(member=alumni).exists())
+
+    def test_signal_address(self) -> None:
+        alumni = Alumni.objects.get(profile__username="Mounfem")
+
+        alumni.address.zip = "28759"
+        alumni.address.save()
+
+        location = MemberLocation.objects.get(member=alumni)
+        self.assertEqual((location.lat, location.lon), (53.1094, 8.7814))
+
+        alumni.address.zip = "99999"
+        alumni.address.save()
+        self.assertFalse(MemberLocation.objects.filter(member=alumni).exists())
+
+    def test_signal_approval(self) -> None:
+        alumni = Alumni.objects.get(profile__username="Mounfem")
+
+        alumni.approval.approval = False
+        alumni.approval.save()
+        self.assertFalse(MemberLocation.objects.filter(member=alumni).exists())
+
+
+class GetLocManyTest(TestCase):
+    fixtures = ["registry/tests/fixtures/integration.json"]
+
+    def setUp(self) -> None:
+        GeoLocation.objects.bulk_create(
+            [
+                GeoLocation(
+                    country="NL",
+                    zip="1011",
+                    group1="Noord-Holland",
+                    group2="Amsterdam",
+                    group3="",
+                    lat=52.0,
+                    lon=4.0,
+                ),
+                GeoLocation(
+                    country="NL",
+                    zip="1012",
+                    group1="Noord-Holland",
+                    group2="Amsterdam",
+                    group3="",
+                    lat=53.0,
+                    lon=5.0,
+                ),
+            ]
+        )
+
+    def test_get_loc_many(self) -> None:
+        with self.assertNumQueries(1):
+            coords = GeoLocation.getLocMany(
+                [
+                    ("DE", "28759", False),
+                    ("RO", "400124", False),
+                    ("DE", "00000", False),
+                    ("NL", "1012 AB", False),
+                    (None, None, False),
+                ]
+            )
+
+        self.assertListEqual(
+            coords,
+            [
+                (53.1094, 8.7814),
+                (46.7667, 23.6),
+                (None, None),
+                (53.0, 5.0),
+                (None, None),
+            ],
+        )
+
+    def test_get_loc_many_reduced(self) -> None:
+        GeoCentroid.rebuild()
+
+        coords = GeoLocation.getLocMany(
+            [("NL", "1012 AB", True), ("DE", "28759", True)]
+        )
+        self.assertListEqual(coords, [(52.5, 4.5), (53.1094, 8.7814)])
+        self.assertEqual(GeoLocation.getLoc("NL", "1011", True), (52.5, 4.5))
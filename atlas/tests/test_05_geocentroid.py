@@ -0,0 +1,114 @@
+from __future__ import annotations
+
+from django.test import TestCase
+
+from atlas.models import GeoCentroid, GeoLocation
+
+
+class GeoCentroidTest(TestCase):
+    def setUp(self) -> None:
+        def loc(zip: str, group3: str, lat: float, lon: float) -> GeoLocation:
+            return GeoLocation(
+                country="DE",
+                zip=zip,
+                group1="Bremen",
+                group2="Bremen, Stadt",
+                group3=group3,
+                lat=lat,
+                lon=lon,
+            )
+
+        GeoLocation.objects.bulk_create(
+            [
+                loc("28195", "Mitte", 53.0, 8.0),
+                loc("28203", "Mitte", 53.2, 8.2),
+                loc("28759", "Nord", 53.6, 8.6),
+                GeoLocation(
+                    country="DE",
+                    zip="10115",
+                    group1="Berlin",
+                    group2="",
+                    group3="Berlin",
+                    lat=52.5,
+                    lon=13.4,
+                ),
+            ]
+        )
+        GeoCentroid.rebuild()
+
+    def test_rebuild(self) -> None:
+        centroids = {
+            c.key(): (round(c.lat, 4), round(c.lon, 4))
+            for c in GeoCentroid.objects.all()
+        }
+        self.assertDictEqual(
+            centroids,
+            {
+                ("DE", "Bremen"): (53.2667, 8.2667),
+                ("DE", "Berlin"): (52.5, 13.4),
+                ("DE", "Bremen", "Bremen, Stadt"): (53.2667, 8.2667),
+                ("DE", "Bremen", "Bremen, Stadt", "Mitte"): (53.1, 8.1),
+                ("DE", "Bremen", "Bremen, Stadt", "Nord"): (53.6, 8.6),
+            },
+        )
+
+    def test_reduced_accuracy(self) -> None:
+        # same point for every member in the same division
+        a = GeoLocation.objects.get(zip="28195").reduced_accuracy()
+        b = GeoLocation.objects.get(zip="28203").reduced_accuracy()
+        self.assertEqual((a.lat, a.lon), (b.lat, b.lon))
+        self.assertAlmostEqual(a.lat, 53.1)
+
+        # only the first non-empty groups are used
+        c = GeoLocation.objects.get(zip="10115").reduced_accuracy()
+        self.assertEqual((c.lat, c.lon), (52.5, 13.4))
+
+    def test_reduced_accuracy_missing(self) -> None:
+        GeoCentroid.objects.all().delete()
+
+        self.assertIsNone(GeoLocation.objects.get(zip="28195").reduced_accuracy())
+        self.assertEqual(GeoLocation.getLoc("DE", "28195", True), (None, None))
+        self.assertEqual(GeoLocation.getLoc("DE", "28195", False), (53.0, 8.0))
+
+    def test_reduced_accuracy_no_groups(self) -> None:
+        GeoLocation.objects.bulk_create(
+            GeoLocation(
+                country="LU",
+                zip=code,
+                group1="",
+                group2="",
+                group3="",
+                lat=lat,
+                lon=lat,
+            )
+            for code, lat in [("1111", 49.1), ("2222", 49.5), ("3333", 49.9)]
+        )
+
+        # every location is resolved on its own, like by getLoc
+        coords = GeoLocation.getLocMany(
+            [("LU", "1111", True), ("LU", "2222", True), ("LU", "3333", True)]
+        )
+        self.assertListEqual(coords, [(49.1, 49.1), (49.5, 49.5), (49.9, 49.9)])
+        for code, expected in zip(["1111", "2222", "3333"], coords):
+            self.assertEqual(GeoLocation.getLoc("LU", code, True), expected)
+
+    def test_reduced_accuracy_many_regions(self) -> None:
+        # more regions than SQLite allows OR branches in a single expression
+        GeoLocation.objects.bulk_create(
+            GeoLocation(
+                country="FR",
+                zip="{:05d}".format(i),
+                group1="Region {}".format(i),
+                group2="",
+                group3="",
+                lat=45.0,
+                lon=float(i % 180),
+            )
+            for i in range(1500)
+        )
+        GeoCentroid.rebuild()
+
+        coords = GeoLocation.getLocMany(
+            ("FR", "{:05d}".format(i), True) for i in range(1500)
+        )
+        self.assertListEqual(coords, [(45.0, float(i % 180)) for i in range(1500)])
@@ -0,0 +1,70 @@
+from __future__ import annotations
+
+import gzip
+import json
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.test import TestCase
+from django.urls import reverse
+
+from alumni.models import Alumni
+from atlas.models import MemberLocation
+
+
+class AtlasDataViewTest(TestCase):
+    fixtures = ["registry/tests/fixtures/integration.json"]
+
+    PARAMS = {"zoom": 1, "bbox": "-80,-170,80,170"}
+
+    def setUp(self) -> None:
+        cache.clear()
+        MemberLocation.rebuild()
+        self.client.force_login(User.objects.get(username="Mounfem"))
+
+    def _count(self, content: bytes) -> int:
+        return sum(c[2] for c in json.loads(content))
+
+    def test_headers(self) -> None:
+        response = self.client.get(reverse("atlas_clusters"), self.PARAMS)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response["Content-Type"], "application/json")
+        self.assertIn("ETag", response)
+        self.assertIn("Last-Modified", response)
+        self.assertEqual(self._count(response.content), 6)
+
+    def test_gzip(self) -> None:
+        response = self.client.get(
+            reverse("atlas_clusters"),
+            self.PARAMS,
+            HTTP_ACCEPT_ENCODING="gzip, deflate",
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response["Content-Encoding"], "gzip")
+        self.assertEqual(self._count(gzip.decompress(response.content)), 6)
+
+    def test_revalidate(self) -> None:
+        etag = self.client.get(reverse("atlas_clusters"), self.PARAMS)["ETag"]
+
+        response = self.client.get(
+            reverse("atlas_clusters"), self.PARAMS, HTTP_IF_NONE_MATCH=etag
+        )
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response["ETag"], etag)
+
+        # changing a member location changes the etag
+        alumni = Alumni.objects.get(profile__username="Mounfem")
+        alumni.atlas.included = False
+        alumni.atlas.save()
+
+        response = self.client.get(
+            reverse("atlas_clusters"), self.PARAMS, HTTP_IF_NONE_MATCH=etag
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response["ETag"], etag)
+        self.assertEqual(self._count(response.content), 5)
+
+    def test_denied(self) -> None:
+        self.client.force_login(User.objects.get(username="Douner"))
+        response = self.client.get(reverse("atlas_clusters"), self.PARAMS)
+        self.assertEqual(response.status_code, 404)
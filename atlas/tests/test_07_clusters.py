@@ -0,0 +1,95 @@
+from __future__ import annotations
+
+import json
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.test import TestCase
+from django.urls import reverse
+
+from atlas import clustering
+from atlas.models import MemberLocation
+
+
+class ClusteringTest(TestCase):
+    fixtures = ["registry/tests/fixtures/integration.json"]
+
+    def setUp(self) -> None:
+        cache.clear()
+        MemberLocation.rebuild()
+
+    def test_tiles_for_bbox(self) -> None:
+        self.assertListEqual(clustering.tiles_for_bbox(0, -90, -180, 90, 180), [(0, 0)])
+        self.assertListEqual(
+            clustering.tiles_for_bbox(1, 10, -10, 20, 10), [(0, 0), (1, 0)]
+        )
+
+        # crossing the antimeridian
+        self.assertListEqual(
+            clustering.tiles_for_bbox(2, -10, 170, 10, -170),
+            [(3, 1), (3, 2), (0, 1), (0, 2)],
+        )
+
+        with self.assertRaises(clustering.ClusteringError):
+            clustering.tiles_for_bbox(21, -10, -10, 10, 10)
+
+    def test_tiles_for_bbox_cropped(self) -> None:
+        # too large boxes are cropped around their center
+        tiles = clustering.tiles_for_bbox(10, -80, -170, 80, 170)
+        self.assertLessEqual(len(tiles), clustering.MAX_TILES)
+        self.assertGreater(len(tiles), clustering.MAX_TILES // 2)
+        self.assertIn((512, 512), tiles)
+
+        # e.g. a wide screen at zoom 4
+        tiles = clustering.tiles_for_bbox(4, -75, -170, 75, 170)
+        self.assertLessEqual(len(tiles), clustering.MAX_TILES)
+
+    def test_clusters(self) -> None:
+        # everything is clustered at the lowest zoom
+        clusters = clustering.clusters_for_tiles("v1", 0, [(0, 0)])
+        self.assertEqual(sum(c[2] for c in clusters), 6)
+        self.assertLess(len(clusters), 6)
+
+        # at a high zoom level every member is on their own
+        clusters = clustering.clusters_for_tiles(
+            "v1", 9, clustering.tiles_for_bbox(9, 53, 8.5, 53.2, 9)
+        )
+        self.assertListEqual(clusters, [(53.1094, 8.7814, 1)])
+
+    def test_clusters_view(self) -> None:
+        self.client.force_login(User.objects.get(username="Mounfem"))
+
+        response = self.client.get(
+            reverse("atlas_clusters"), {"zoom": 1, "bbox": "-80,-170,80,170"}
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(sum(c[2] for c in json.loads(response.content)), 6)
+
+        etag = response["ETag"]
+        response = self.client.get(
+            reverse("atlas_clusters"),
+            {"zoom": 1, "bbox": "-80,-170,80,170"},
+            HTTP_IF_NONE_MATCH=etag,
+        )
+        self.assertEqual(response.status_code, 304)
+
+        response = self.client.get(reverse("atlas_clusters"), {"zoom": 1})
+        self.assertEqual(response.status_code, 400)
+
+    def test_clusters_view_tiles(self) -> None:
+        self.client.force_login(User.objects.get(username="Mounfem"))
+
+        # boxes covering the same tiles share a response
+        a = self.client.get(
+            reverse("atlas_clusters"), {"zoom": 1, "bbox": "-80,-170,80,170"}
+        )
+        b = self.client.get(
+            reverse("atlas_clusters"), {"zoom": 1, "bbox": "-70,-160,70,160.5"}
+        )
+        self.assertEqual(a["ETag"], b["ETag"])
+
+        # too large boxes are cropped rather than rejected
+        response = self.client.get(
+            reverse("atlas_clusters"), {"zoom": 10, "bbox": "-80,-170,80,170"}
+        )
+        self.assertEqual(response.status_code, 200)
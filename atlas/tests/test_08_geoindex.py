@@ -0,0 +1,92 @@
+from __future__ import annotations
+
+import os
+import tempfile
+from unittest import mock
+
+from django.test import TestCase, override_settings
+
+from atlas import geoindex
+from atlas.models import GeoLocation
+
+
+class GeoIndexTest(TestCase):
+    fixtures = ["registry/tests/fixtures/integration.json"]
+
+    def setUp(self) -> None:
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmpdir.name, "geolocation.idx")
+
+    def tearDown(self) -> None:
+        self.tmpdir.cleanup()
+
+    def test_write_and_lookup(self) -> None:
+        count = geoindex.write_index(
+            self.path,
+            [
+                ("NL", "1012", "Noord-Holland", "Amsterdam", "", 52.37, 4.89),
+                ("DE", "28759", "Bremen", "", "Bremen", 53.1, 8.7),
+                ("DE", "01067", "Sachsen", "Dresden", "", 51.05, 13.73),
+                ("DE", "toolongzipcode", "", "", "", 0.0, 0.0),
+            ],
+        )
+        self.assertEqual(count, 3)
+
+        index = geoindex.GeoIndex(self.path)
+        self.assertEqual(index.count, 3)
+        self.assertEqual(
+            index.lookup("DE", "28759"),
+            ("DE", "28759", "Bremen", "", "Bremen", 53.1, 8.7),
+        )
+        self.assertEqual(
+            index.lookup("NL", "1012"),
+            ("NL", "1012", "Noord-Holland", "Amsterdam", "", 52.37, 4.89),
+        )
+        self.assertIsNone(index.lookup("DE", "28758"))
+        self.assertIsNone(index.lookup("US", "28759"))
+        self.assertIsNone(index.lookup("ZZ", "99999"))
+
+    @mock.patch("atlas.geoindex.RUN_SIZE", 2)
+    def test_external_sort(self) -> None:
+        rows = [
+            ("DE", "{:05d}".format((i * 7919) % 50), "", "", "", float(i), 0.0)
+            for i in range(100)
+        ]
+        count = geoindex.write_index(self.path, rows)
+        self.assertEqual(count, 50)
+
+        # of several records with the same key the first one is kept
+        index = geoindex.GeoIndex(self.path)
+        keys = [index._key_at(i) for i in range(index.count)]
+        self.assertListEqual(keys, sorted(keys))
+        for zip in ["00000", "00013", "00049"]:
+            first = next(row for row in rows if row[1] == zip)
+            self.assertEqual(index.lookup("DE", zip), first)
+
+    def test_get_loc_many(self) -> None:
+        geoindex.write_index(self.path, GeoLocation.index_rows())
+
+        with override_settings(GEOLOCATION_INDEX=self.path):
+            with self.assertNumQueries(0):
+                coords = GeoLocation.getLocMany(
+                    [
+                        ("DE", "28759", False),
+                        ("RO", "400124", False),
+                        ("DE", "0", False),
+                    ]
+                )
+            self.assertListEqual(
+                coords, [(53.1094, 8.7814), (46.7667, 23.6), (None, None)]
+            )
+
+            # a new import is picked up automatically
+            geoindex.write_index(self.path, [("DE", "28759", "", "", "", 1.0, 2.0)])
+            self.assertEqual(GeoLocation.getLoc("DE", "28759", False), (1.0, 2.0))
+            self.assertEqual(GeoLocation.getLoc("RO", "400124", False), (None, None))
+
+    def test_missing_index(self) -> None:
+        with override_settings(GEOLOCATION_INDEX=self.path):
+            self.assertIsNone(geoindex.get_index())
+            self.assertEqual(
+                GeoLocation.getLoc("DE", "28759", False), (53.1094, 8.7814)
+            )
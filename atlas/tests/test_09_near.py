@@ -0,0 +1,99 @@
+from __future__ import annotations
+
+from django.test import TestCase
+
+from alumni.models import Alumni
+from atlas import spatial
+from atlas.models import MemberLocation, SearchDocument
+from atlas.views import search
+from registry.search import operators as ops
+from registry.search.filter import NEAR_PARSING_ERROR, ParsingError
+
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from typing import List, Optional, Tuple
+
+BREMEN = (53.1094, 8.7814)
+
+
+class NearSearchTest(TestCase):
+    fixtures = ["registry/tests/fixtures/integration.json"]
+
+    def setUp(self) -> None:
+        MemberLocation.rebuild()
+        SearchDocument.rebuild()
+
+    def _search(
+        self, query: str, origin: Optional[Tuple[float, float]] = BREMEN
+    ) -> List[str]:
+        q, err = search(Alumni.objects.all(), query, origin=origin)
+        if err is not None:
+            raise err
+        return sorted(
+            Alumni.objects.filter(q).values_list("profile__username", flat=True)
+        )
+
+    def test_parse_near(self) -> None:
+        self.assertEqual(spatial.parse_near(50.0), (None, 50.0))
+        self.assertEqual(spatial.parse_near("50km"), (None, 50.0))
+        self.assertEqual(spatial.parse_near("Berlin"), ("Berlin", 25.0))
+        self.assertEqual(spatial.parse_near("Berlin, 20 km"), ("Berlin", 20.0))
+        self.assertAlmostEqual(spatial.parse_near("10mi")[1], 16.09344)
+
+        with self.assertRaises(ValueError):
+            spatial.parse_near(0)
+
+    def test_quote_near(self) -> None:
+        for query, expected in [
+            ("near: 50km", 'near: "50km"'),
+            ("near:50 mi", 'near: "50mi"'),
+            ('near: "Berlin" 20km', 'near: "Berlin 20km"'),
+            ('near: "Bad Bentheim", 20', 'near: "Bad Bentheim 20"'),
+            ("Elena near: Berlin 20KM", 'Elena near: "Berlin 20KM"'),
+            ("near: 50", "near: 50"),
+            ('near: "Berlin"', 'near: "Berlin"'),
+            ("near: Berlin 2020", "near: Berlin 2020"),
+            ("linear: 50km", "linear: 50km"),
+            ('"near 5km"', '"near 5km"'),
+            ('"near: 5km"', '"near: 5km"'),
+            (
+                '"walk near: 5km" near: Berlin 5km',
+                '"walk near: 5km" near: "Berlin 5km"',
+            ),
+        ]:
+            self.assertEqual(ops.quote_near(query), expected, query)
+
+    def test_near_me(self) -> None:
+        self.assertListEqual(self._search("near: 10"), ["Ramila"])
+        self.assertListEqual(self._search("near: 200"), ["Aint1975", "Ramila"])
+        self.assertListEqual(
+            self._search('near: "400km"'), ["Aint1975", "Mounfem", "Ramila"]
+        )
+
+    def test_near_combined(self) -> None:
+        self.assertListEqual(self._search("Klaus near: 200"), ["Aint1975"])
+        self.assertListEqual(self._search("not (near: 200) and near: 400"), ["Mounfem"])
+
+    def test_near_units(self) -> None:
+        self.assertListEqual(self._search("near: 200km"), ["Aint1975", "Ramila"])
+        self.assertListEqual(self._search("near: 125 mi"), ["Aint1975", "Ramila"])
+        self.assertListEqual(self._search("Klaus near: 200km"), ["Aint1975"])
+
+    def test_near_place(self) -> None:
+        self.assertListEqual(self._search('near: "Jefferson 10km"'), ["Hichat"])
+        self.assertListEqual(self._search('near: "Jefferson" 10km'), ["Hichat"])
+        self.assertListEqual(self._search("near: Jefferson 10km"), ["Hichat"])
+        self.assertListEqual(
+            self._search('near: "Breunsdorf 200km"', origin=None), ["Mounfem"]
+        )
+
+    def test_near_errors(self) -> None:
+        with self.assertRaises(ParsingError):
+            self._search("near: 50", origin=None)
+        with self.assertRaises(ParsingError):
+            self._search('near: "Atlantis"')
+        with self.assertRaises(ParsingError):
+            self._search("near > 50")
+        with self.assertRaisesMessage(ParsingError, NEAR_PARSING_ERROR):
+            self._search("near: 50yd")
@@ -0,0 +1,73 @@
+from __future__ import annotations
+
+from django.contrib.auth.models import User
+from django.test import RequestFactory, TestCase
+from django.urls import reverse
+
+from atlas import spatial
+from atlas.models import MemberLocation, SearchDocument
+from atlas.views import SearchView
+
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from typing import Any, Dict, List
+
+
+class ViewportSearchTest(TestCase):
+    fixtures = ["registry/tests/fixtures/integration.json"]
+
+    def setUp(self) -> None:
+        MemberLocation.rebuild()
+        SearchDocument.rebuild()
+        self.user = User.objects.get(username="Mounfem")
+
+    def _context(self, **params: str) -> Dict[str, Any]:
+        request = RequestFactory().get(reverse("atlas_search"), params)
+        request.user = self.user
+
+        view = SearchView()
+        view.setup(request)
+        view.object_list = view.get_queryset()
+        return view.get_context_data()
+
+    def _search(self, **params: str) -> List[str]:
+        context = self._context(**params)
+        self.assertNotIn("error", context)
+        return [a.profile.username for a in context["page"]]
+
+    def test_parse_bbox(self) -> None:
+        self.assertEqual(spatial.parse_bbox("50,8,54,13"), (50.0, 8.0, 54.0, 13.0))
+        for value in ["", "50,8,54", "a,b,c,d", "54,8,50,13", "50,8,54,190"]:
+            with self.assertRaises(ValueError):
+                spatial.parse_bbox(value)
+
+    def test_bbox(self) -> None:
+        self.assertListEqual(
+            sorted(self._search(bbox="50,8,54,13")), ["Aint1975", "Mounfem", "Ramila"]
+        )
+        self.assertListEqual(
+            sorted(self._search(bbox="20,-100,40,-80", query=" ")),
+            ["Hichat", "Irew1996"],
+        )
+        self.assertListEqual(self._search(bbox="-10,-10,10,10"), [])
+
+    def test_bbox_antimeridian(self) -> None:
+        self.assertListEqual(
+            sorted(self._search(bbox="20,170,40,-80")), ["Hichat", "Irew1996"]
+        )
+
+    def test_bbox_query(self) -> None:
+        self.assertListEqual(
+            self._search(bbox="50,8,54,13", query="Klaus"), ["Aint1975"]
+        )
+
+    def test_bbox_invalid(self) -> None:
+        self.assertIn("error", self._context(bbox="1,2,3"))
+
+    def test_redirect(self) -> None:
+        self.client.force_login(self.user)
+        response = self.client.get(reverse("atlas_search"))
+        self.assertRedirects(
+            response, reverse("atlas_home"), fetch_redirect_response=False
+        )
@@ -0,0 +1,318 @@
+from __future__ import annotations
+
+import io
+import os
+import tempfile
+import zipfile
+from contextlib import redirect_stdout
+
+from django.core import management
+from django.db import connection
+from django.test import TestCase, TransactionTestCase
+
+from atlas import geonames
+from atlas.models import (
+    GeoCentroid,
+    GeoLocation,
+    _copy_model,
+    _create_field_indexes,
+)
+
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from typing import Any, List, Tuple
+
+LINES = [
+    "DE\t28759\tBremen\tBremen\tHB\t\t\tBremen\t04011\t53.1094\t8.7814\t4\n",
+    "DE\t28759\tBremen-Nord\tBremen\tHB\t\t\tBremen\t04011\t53.2\t8.8\t4\n",
+    "DE\t37619\tBodenwerder\tNiedersachsen\tNI\t\t\tHolzminden\t03255\t51.9716\t9.5193\t4\n",
+    "DE\tbroken line\n",
+    "NL\t1011 AB\tAmsterdam\tNoord-Holland\tNH\tAmsterdam\t0363\t\t\t52.3\t4.9\t6\n",
+    "DE\t28759\tBremen\tBremen\tHB\t\t\tBremen\t04011\t0.0\t0.0\t4\n",
+]
+
+
+class GeonamesTest(TransactionTestCase):
+    def test_parse_line(self) -> None:
+        location = geonames.parse_line(LINES[4].encode("utf-8"))
+        self.assertEqual(
+            (str(location.country), location.zip, location.group1, location.group2),
+            ("NL", "1011", "NH", "0363"),
+        )
+        self.assertEqual((location.lat, location.lon), (52.3, 4.9))
+
+        self.assertIsNone(geonames.parse_line(LINES[3]))
+
+    def test_parse(self) -> None:
+        self.assertListEqual(
+            [(l.country, l.zip) for l in geonames.parse(iter(LINES))],
+            [("DE", "28759"), ("DE", "37619"), ("NL", "1011"), ("DE", "28759")],
+        )
+
+    def test_parse_parallel(self) -> None:
+        with tempfile.TemporaryDirectory() as tmp:
+            fn = os.path.join(tmp, "allCountries.txt")
+            with open(fn, "w", encoding="utf-8") as f:
+                f.writelines(LINES * 20)
+
+            expected = [
+                (l.country, l.zip, l.lat, l.lon) for l in geonames.parse(LINES * 20)
+            ]
+
+            # every line is parsed exactly once, whatever the range boundaries
+            size = os.path.getsize(fn)
+            for chunk_size in [1, 17, 100, size]:
+                rows = [
+                    row[:2]
+                    for start in range(0, size, chunk_size)
+                    for row in geonames.parse_range(fn, start, start + chunk_size)
+                ]
+                self.assertEqual(len(rows), 5 * 20)
+
+            locations = geonames.parse_parallel(fn, 2, chunk_size=100)
+            self.assertListEqual(
+                [(l.country, l.zip, l.lat, l.lon) for l in locations],
+                expected,
+            )
+
+    def _import(self, fn: str, jobs: int = 1) -> None:
+        with redirect_stdout(io.StringIO()):
+            management.call_command("geocache", fn, jobs=jobs, stderr=io.StringIO())
+
+    def _check_import(self) -> None:
+        self.assertListEqual(
+            list(
+                GeoLocation.objects.order_by("country", "zip").values_list(
+                    "country", "zip", "lat", "lon"
+                )
+            ),
+            [
+                ("DE", "28759", 53.1094, 8.7814),
+                ("DE", "37619", 51.9716, 9.5193),
+                ("NL", "1011", 52.3, 4.9),
+            ],
+        )
+
+    def test_import_text(self) -> None:
+        with tempfile.TemporaryDirectory() as tmp:
+            fn = os.path.join(tmp, "allCountries.txt")
+            with open(fn, "w", encoding="utf-8") as f:
+                f.writelines(LINES)
+            self._import(fn)
+        self._check_import()
+
+    def test_import_zip(self) -> None:
+        with tempfile.TemporaryDirectory() as tmp:
+            fn = os.path.join(tmp, "allCountries.zip")
+            with zipfile.ZipFile(fn, "w") as archive:
+                archive.writestr(geonames.ARCHIVE_MEMBER, "".join(LINES))
+            self._import(fn)
+        self._check_import()
+
+    def test_import_parallel(self) -> None:
+        with tempfile.TemporaryDirectory() as tmp:
+            fn = os.path.join(tmp, "allCountries.zip")
+            with zipfile.ZipFile(fn, "w") as archive:
+                archive.writestr(geonames.ARCHIVE_MEMBER, "".join(LINES))
+            self._import(fn, jobs=2)
+        self._check_import()
+
+    def test_update_data_batches(self) -> None:
+        count = GeoLocation.updateData(geonames.parse(iter(LINES)), batch_size=1)
+        self.assertEqual(count, 3)
+
+    def _indexes(self) -> List[Tuple[Any, ...]]:
+        """Describes the indexes of the GeoLocation table, without their names"""
+        with connection.cursor() as cursor:
+            constraints = connection.introspection.get_constraints(
+                cursor, GeoLocation._meta.db_table
+            )
+        return sorted(
+            (
+                tuple(c["columns"]),
+                c["unique"],
+                c["index"],
+                str(c.get("type")),
+                tuple(c.get("orders") or ()),
+                str(c.get("definition")),
+            )
+            for c in constraints.values()
+            if not c["primary_key"]
+        )
+
+    def test_update_data_swap(self) -> None:
+        before = self._indexes()
+        GeoLocation.updateData(geonames.parse(iter(LINES)))
+
+        table = GeoLocation._meta.db_table
+        with connection.cursor() as cursor:
+            tables = connection.introspection.table_names(cursor)
+            constraints = connection.introspection.get_constraints(cursor, table)
+
+        # the shadow table replaced the table, and no copies are left
+        self.assertIn(table, tables)
+        self.assertFalse([t for t in tables if t.startswith(table + "_")])
+
+        # the indexes were created on the shadow table
+        indexed = [
+            c["columns"] for c in constraints.values() if c["index"] or c["unique"]
+        ]
+        self.assertIn(["country", "zip"], indexed)
+
+        # the indexes are the same as those created by the migrations
+        self.assertListEqual(self._indexes(), before)
+        GeoLocation.updateData(geonames.parse(iter(LINES)))
+        self.assertListEqual(self._indexes(), before)
+
+        # reading and writing works as before
+        location = GeoLocation.objects.get(country="NL", zip="1011")
+        location.lat = 1.0
+        location.save()
+        self.assertEqual(GeoLocation.objects.get(pk=location.pk).lat, 1.0)
+
+    def test_create_field_indexes(self) -> None:
+        field = GeoLocation._meta.get_field("zip").clone()
+        field.set_attributes_from_name("zip")
+        field.db_index = True
+
+        shadow, _ = _copy_model("test")
+        with connection.schema_editor() as editor:
+            editor.create_model(shadow)
+            statements = editor._field_indexes_sql(shadow, field)
+            _create_field_indexes(editor, shadow, [field])
+
+        with connection.cursor() as cursor:
+            constraints = connection.introspection.get_constraints(
+                cursor, shadow._meta.db_table
+            )
+        with connection.schema_editor() as editor:
+            editor.delete_model(shadow)
+
+        # e.g. on PostgreSQL, along with a varchar_pattern_ops index
+        indexes = [
+            c
+            for c in constraints.values()
+            if c["columns"] == ["zip"] and c["index"] and not c["unique"]
+        ]
+        self.assertEqual(len(indexes), len(statements))
+        self.assertGreater(len(indexes), 0)
+
+
+class IncrementalUpdateTest(TransactionTestCase):
+    def setUp(self) -> None:
+        GeoLocation.updateData(geonames.parse(iter(LINES)))
+        self.unchanged = GeoLocation.objects.get(country="DE", zip="28759").pk
+
+    def test_incremental(self) -> None:
+        lines = [
+            LINES[0],
+            LINES[2].replace("51.9716", "52.0"),
+            "DE\t10115\tBerlin\tBerlin\tBE\t\t00\tBerlin\t11000\t52.5323\t13.3846\t4\n",
+        ]
+        counts = GeoLocation.updateDataIncremental(
+            geonames.parse(iter(lines)), batch_size=1
+        )
+        self.assertDictEqual(counts, {"inserted": 1, "updated": 1, "deleted": 1})
+
+        self.assertListEqual(
+            list(
+                GeoLocation.objects.order_by("country", "zip").values_list(
+                    "country", "zip", "lat", "lon"
+                )
+            ),
+            [
+                ("DE", "10115", 52.5323, 13.3846),
+                ("DE", "28759", 53.1094, 8.7814),
+                ("DE", "37619", 52.0, 9.5193),
+            ],
+        )
+        self.assertEqual(
+            GeoLocation.objects.get(country="DE", zip="28759").pk, self.unchanged
+        )
+
+        # the staging table is removed again
+        self.assertFalse(
+            [
+                t
+                for t in connection.introspection.table_names()
+                if t.startswith("atlas_geolocation_staging")
+            ]
+        )
+
+    def test_incremental_unchanged(self) -> None:
+        counts = GeoLocation.updateDataIncremental(geonames.parse(iter(LINES)))
+        self.assertDictEqual(counts, {"inserted": 0, "updated": 0, "deleted": 0})
+
+    def test_incremental_command(self) -> None:
+        with tempfile.TemporaryDirectory() as tmp:
+            fn = os.path.join(tmp, "allCountries.txt")
+            with open(fn, "w", encoding="utf-8") as f:
+                f.writelines(LINES[:3])
+
+            out = io.StringIO()
+            with redirect_stdout(out):
+                management.call_command(
+                    "geocache", fn, incremental=True, stderr=io.StringIO()
+                )
+
+        self.assertIn("inserted 0, updated 0 and deleted 1 locations", out.getvalue())
+        self.assertEqual(GeoLocation.objects.count(), 2)
+
+
+class UpdateDataAtomicTest(TestCase):
+    def test_update_data_atomic(self) -> None:
+        count = GeoLocation.updateData(geonames.parse(iter(LINES)))
+        self.assertEqual(count, 3)
+
+
+class ImportModesTest(TransactionTestCase):
+    fixtures = ["registry/tests/fixtures/integration.json"]
+
+    def _import(self, **options: Any) -> None:
+        with tempfile.TemporaryDirectory() as tmp:
+            fn = os.path.join(tmp, "allCountries.txt")
+            with open(fn, "w", encoding="utf-8") as f:
+                f.writelines(LINES)
+
+            with redirect_stdout(io.StringIO()):
+                management.call_command(
+                    "geocache", fn, jobs=1, stderr=io.StringIO(), **options
+                )
+
+    def _stored(self) -> List[Tuple[str, str]]:
+        return list(
+            GeoLocation.objects.order_by("country", "zip").values_list("country", "zip")
+        )
+
+    def test_countries(self) -> None:
+        self._import(countries="nl")
+        self.assertListEqual(self._stored(), [("NL", "1011")])
+        self.assertListEqual(
+            list(GeoCentroid.objects.values_list("country", flat=True).distinct()),
+            ["NL"],
+        )
+
+    def test_referenced(self) -> None:
+        with tempfile.TemporaryDirectory() as tmp:
+            index = os.path.join(tmp, "geolocation.idx")
+            with self.settings(GEOLOCATION_INDEX=index):
+                self._import(referenced=True)
+
+                # only the zips of addresses are stored
+                self.assertListEqual(self._stored(), [("DE", "28759"), ("DE", "37619")])
+
+                # centroids are computed from all locations
+                self.assertEqual(
+                    GeoCentroid.objects.get(
+                        country="NL", group1="NH", group2="0363"
+                    ).lat,
+                    52.3,
+                )
+
+                # other locations are resolved from the index and stored on demand
+                self.assertEqual(
+                    GeoLocation.getLoc("NL", "1011 AB", False), (52.3, 4.9)
+                )
+                GeoLocation.materialize("NL", "1011 AB")
+                self.assertIn(("NL", "1011"), self._stored())
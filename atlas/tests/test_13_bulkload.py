@@ -0,0 +1,70 @@
+from __future__ import annotations
+
+from django.test import TestCase
+
+from atlas import bulkload
+from atlas.models import GeoLocation
+
+
+class BulkLoadTest(TestCase):
+    def _location(self, zip: str, lat: float, group1: str = "") -> GeoLocation:
+        return GeoLocation(
+            country="DE",
+            zip=zip,
+            group1=group1,
+            group2="",
+            group3="",
+            lat=lat,
+            lon=1.0,
+        )
+
+    def test_copy_line(self) -> None:
+        self.assertEqual(
+            bulkload.copy_line(("DE", "a\tb\\c\nd", None, 1.5, 2)),
+            "DE\ta\\tb\\\\c\\nd\t\\N\t1.5\t2\n",
+        )
+
+    def test_copy_reader(self) -> None:
+        rows = [("DE", str(i), "Ünïcode") for i in range(100)]
+        expected = "".join(bulkload.copy_line(r) for r in rows).encode("utf-8")
+
+        reader = bulkload.CopyReader(rows)
+        chunks = []
+        while True:
+            chunk = reader.read(7)
+            if not chunk:
+                break
+            self.assertLessEqual(len(chunk), 7)
+            chunks.append(chunk)
+
+        self.assertEqual(b"".join(chunks), expected)
+        self.assertEqual(reader.count, 100)
+
+    def test_insert(self) -> None:
+        self._location("10115", 0.0).save()
+
+        count = bulkload.insert(
+            GeoLocation,
+            [
+                self._location("10115", 1.0),
+                self._location("28759", 2.0, "Bremen\tNord"),
+                self._location("28759", 3.0),
+                self._location("37619", 4.0),
+            ],
+            batch_size=2,
+        )
+        self.assertEqual(count, 4)
+
+        # conflicting rows are ignored, the first of duplicate rows is kept
+        self.assertListEqual(
+            list(
+                GeoLocation.objects.filter(country="DE")
+                .order_by("zip")
+                .values_list("zip", "lat", "group1")
+            ),
+            [
+                ("10115", 0.0, ""),
+                ("28759", 2.0, "Bremen\tNord"),
+                ("37619", 4.0, ""),
+            ],
+        )
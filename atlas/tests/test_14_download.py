@@ -0,0 +1,209 @@
+from __future__ import annotations
+
+import io
+import json
+import os
+import tempfile
+import threading
+import zipfile
+from contextlib import redirect_stdout
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest import mock
+
+from django.core import management
+from django.test import SimpleTestCase, TransactionTestCase
+
+from atlas import download, geonames
+from atlas.models import GeoLocation
+
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from typing import Any, Dict, List
+
+LINE = "DE\t28759\tBremen\tBremen\tHB\t\t\tBremen\t04011\t53.1094\t8.7814\t4\n"
+
+
+class FileServer(object):
+    """Serves a single file supporting conditional and range requests"""
+
+    def __init__(self, content: bytes):
+        self.content = content
+        self.etag = '"v1"'
+        self.last_modified = "Mon, 01 Jan 2024 00:00:00 GMT"
+        self.requests: List[Dict[str, Any]] = []
+
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self) -> None:
+                server.requests.append(dict(self.headers))
+                content = server.content
+
+                if self.headers.get("If-None-Match") == server.etag:
+                    self.send_response(304)
+                    self.end_headers()
+                    return
+
+                start = 0
+                range_ = self.headers.get("Range")
+                if range_ and self.headers.get("If-Range") == server.etag:
+                    start = int(range_[len("bytes=") : -1])
+                    self.send_response(206)
+                    self.send_header(
+                        "Content-Range",
+                        "bytes {}-{}/{}".format(start, len(content) - 1, len(content)),
+                    )
+                else:
+                    self.send_response(200)
+
+                self.send_header("ETag", server.etag)
+                self.send_header("Last-Modified", server.last_modified)
+                self.send_header("Content-Length", str(len(content) - start))
+                self.end_headers()
+                self.wfile.write(content[start:])
+
+            def log_message(self, *args: Any) -> None:
+                pass
+
+        self.httpd = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.url = "http://127.0.0.1:{}/allCountries.zip".format(
+            self.httpd.server_address[1]
+        )
+        self.thread = threading.Thread(target=self.httpd.serve_forever)
+        self.thread.start()
+
+    def close(self) -> None:
+        self.httpd.shutdown()
+        self.httpd.server_close()
+        self.thread.join()
+
+
+class DownloadTest(SimpleTestCase):
+    def setUp(self) -> None:
+        self.server = FileServer(os.urandom(3 * download.CHUNK_SIZE // 2))
+        self.addCleanup(self.server.close)
+
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.dir = tmp.name
+
+    def _read(self, path: str) -> bytes:
+        with open(path, "rb") as f:
+            return f.read()
+
+    def test_fetch(self) -> None:
+        path, changed = download.fetch(self.server.url, self.dir, progress=False)
+        self.assertTrue(changed)
+        self.assertEqual(self._read(path), self.server.content)
+
+        with open(path + ".json") as f:
+            metadata = json.load(f)
+        self.assertEqual(metadata["etag"], self.server.etag)
+        self.assertEqual(metadata["size"], len(self.server.content))
+        self.assertEqual(metadata["sha256"], download.sha256sum(path))
+
+        # an unchanged file is not transferred again
+        path, changed = download.fetch(self.server.url, self.dir, progress=False)
+        self.assertFalse(changed)
+        self.assertEqual(self.server.requests[-1]["If-None-Match"], self.server.etag)
+
+        # a changed file is
+        self.server.content = b"new content"
+        self.server.etag = '"v2"'
+        path, changed = download.fetch(self.server.url, self.dir, progress=False)
+        self.assertTrue(changed)
+        self.assertEqual(self._read(path), b"new content")
+
+    def test_fetch_corrupted(self) -> None:
+        path, _ = download.fetch(self.server.url, self.dir, progress=False)
+        with open(path, "r+b") as f:
+            f.write(b"corrupted")
+
+        # a corrupted cache is downloaded again, unconditionally
+        _, changed = download.fetch(self.server.url, self.dir, progress=False)
+        self.assertTrue(changed)
+        self.assertNotIn("If-None-Match", self.server.requests[-1])
+        self.assertEqual(self._read(path), self.server.content)
+
+    def test_fetch_resume(self) -> None:
+        path = download.cache_path(self.dir, self.server.url)
+        with open(path + ".part", "wb") as f:
+            f.write(self.server.content[:1000])
+        with open(path + ".part.json", "w") as f:
+            json.dump({"etag": self.server.etag, "last_modified": None}, f)
+
+        path, changed = download.fetch(self.server.url, self.dir, progress=False)
+        self.assertTrue(changed)
+        self.assertEqual(self.server.requests[-1]["Range"], "bytes=1000-")
+        self.assertEqual(self._read(path), self.server.content)
+        self.assertFalse(os.path.exists(path + ".part"))
+
+    def test_fetch_resume_changed(self) -> None:
+        path = download.cache_path(self.dir, self.server.url)
+        with open(path + ".part", "wb") as f:
+            f.write(b"old content")
+        with open(path + ".part.json", "w") as f:
+            json.dump({"etag": '"v0"', "last_modified": None}, f)
+
+        # the server sends the entire new file
+        path, _ = download.fetch(self.server.url, self.dir, progress=False)
+        self.assertEqual(self._read(path), self.server.content)
+
+
+class DownloadCommandTest(TransactionTestCase):
+    def test_command(self) -> None:
+        content = io.BytesIO()
+        with zipfile.ZipFile(content, "w") as archive:
+            archive.writestr(geonames.ARCHIVE_MEMBER, LINE)
+
+        server = FileServer(content.getvalue())
+        self.addCleanup(server.close)
+
+        with tempfile.TemporaryDirectory() as tmp:
+            with self.settings(GEOCACHE_DOWNLOAD_DIR=tmp):
+                out = io.StringIO()
+                with redirect_stdout(out):
+                    management.call_command(
+                        "geocache", url=server.url, jobs=1, stderr=io.StringIO()
+                    )
+                self.assertEqual(GeoLocation.objects.count(), 1)
+
+                GeoLocation.objects.all().delete()
+                out = io.StringIO()
+                with redirect_stdout(out):
+                    management.call_command(
+                        "geocache", url=server.url, jobs=1, stderr=io.StringIO()
+                    )
+                self.assertIn("unchanged, nothing to do", out.getvalue())
+                self.assertEqual(GeoLocation.objects.count(), 0)
+
+    def test_command_failed_import(self) -> None:
+        content = io.BytesIO()
+        with zipfile.ZipFile(content, "w") as archive:
+            archive.writestr(geonames.ARCHIVE_MEMBER, LINE)
+
+        server = FileServer(content.getvalue())
+        self.addCleanup(server.close)
+
+        with tempfile.TemporaryDirectory() as tmp:
+            with self.settings(GEOCACHE_DOWNLOAD_DIR=tmp):
+                with mock.patch.object(
+                    GeoLocation, "updateData", side_effect=RuntimeError("crash")
+                ):
+                    with self.assertRaises(RuntimeError), redirect_stdout(
+                        io.StringIO()
+                    ):
+                        management.call_command(
+                            "geocache", url=server.url, jobs=1, stderr=io.StringIO()
+                        )
+
+                # the unchanged download is imported by the next run
+                out = io.StringIO()
+                with redirect_stdout(out):
+                    management.call_command(
+                        "geocache", url=server.url, jobs=1, stderr=io.StringIO()
+                    )
+                self.assertNotIn("nothing to do", out.getvalue())
+                self.assertEqual(server.requests[-1]["If-None-Match"], server.etag)
+                self.assertEqual(GeoLocation.objects.count(), 1)
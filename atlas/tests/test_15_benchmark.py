@@ -0,0 +1,31 @@
+from __future__ import annotations
+
+from django.test import SimpleTestCase
+
+from atlas import benchmark, geonames
+
+
+class BenchmarkTest(SimpleTestCase):
+    def test_synthetic_lines(self) -> None:
+        lines = list(benchmark.synthetic_lines(1000, seed=42))
+        self.assertEqual(len(lines), 1000)
+        self.assertListEqual(lines, list(benchmark.synthetic_lines(1000, seed=42)))
+        self.assertNotEqual(lines, list(benchmark.synthetic_lines(1000, seed=43)))
+
+        # all lines can be parsed, and are grouped by country
+        rows = [geonames.parse_row(line) for line in lines]
+        self.assertNotIn(None, rows)
+        countries = [row[0] for row in rows]
+        self.assertListEqual(countries, sorted(countries))
+        self.assertSetEqual(set(countries), set(benchmark.COUNTRIES))
+
+        for country, zip, *_ in rows:
+            if country == "CA":
+                self.assertRegex(zip, r"^[a-z][0-9][a-z]$")
+            elif country == "GB":
+                self.assertRegex(zip, r"^[a-z]{1,2}[0-9][0-9a-z]{0,2}$")
+            elif country == "NL":
+                self.assertRegex(zip, r"^[0-9]{4}$")
+
+    def test_peak_rss(self) -> None:
+        self.assertGreater(benchmark.peak_rss(), 1024 * 1024)
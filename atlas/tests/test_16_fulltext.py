@@ -0,0 +1,86 @@
+from __future__ import annotations
+
+from unittest import mock
+
+from django.test import TestCase
+
+from alumni.models import Alumni
+from atlas import fulltext
+from atlas.models import SearchDocument
+from atlas.views import search
+
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from typing import List
+
+
+class FullTextSearchTest(TestCase):
+    fixtures = ["registry/tests/fixtures/integration.json"]
+
+    def setUp(self) -> None:
+        SearchDocument.rebuild()
+        search.cache_clear()
+
+    def _search(self, query: str) -> List[int]:
+        q, err = search(Alumni.objects.all(), query)
+        if err is not None:
+            raise err
+        return sorted(Alumni.objects.filter(q).values_list("pk", flat=True))
+
+    def test_backend(self) -> None:
+        self.assertEqual(fulltext.backend(), "sqlite")
+
+    def test_rebuild(self) -> None:
+        self.assertEqual(SearchDocument.objects.count(), Alumni.objects.count())
+        self.assertIn("Spanish", SearchDocument.objects.get(member_id=1).text)
+
+    def test_search(self) -> None:
+        self.assertListEqual(self._search("Spanish"), [1])
+        self.assertListEqual(self._search("court judge"), [2])
+        self.assertListEqual(self._search('"Human Rights"'), [1])
+        self.assertListEqual(self._search("Spanish Lecturer"), [])
+
+    def test_search_prefix(self) -> None:
+        self.assertListEqual(self._search("Research"), [1, 4])
+        self.assertListEqual(self._search("spani"), [1])
+
+    def test_search_fields(self) -> None:
+        self.assertListEqual(self._search("job: 9 Bremen"), [9])
+
+    def test_rank(self) -> None:
+        members = Alumni.objects.filter(pk__in=[1, 10])
+        ranked = fulltext.order_by_rank(members, ["junior engineer"], "familyName")
+        self.assertListEqual([a.pk for a in ranked], [10, 1])
+
+    def test_text_terms(self) -> None:
+        self.assertListEqual(
+            search.text_terms('Spanish "Human Rights" city: Bremen'),
+            ["Spanish", "Human Rights"],
+        )
+        self.assertListEqual(search.text_terms("city: Bremen"), [])
+
+    def test_signals(self) -> None:
+        member = Alumni.objects.get(pk=3)
+        member.job.employer = "Antarctic Penguin Survey"
+        member.job.save()
+        self.assertListEqual(self._search("penguin"), [3])
+        self.assertListEqual(self._search("Johnson"), [])
+
+        member.familyName = "Zyxwv"
+        member.save()
+        self.assertListEqual(self._search("zyxwv"), [3])
+
+        member.delete()
+        self.assertFalse(SearchDocument.objects.filter(member_id=3).exists())
+        self.assertListEqual(self._search("zyxwv"), [])
+
+    def test_fallback(self) -> None:
+        self.addCleanup(search.cache_clear)
+        with mock.patch("atlas.fulltext.backend", return_value=None):
+            self.assertListEqual(self._search("Research"), [1, 4])
+            self.assertListEqual(self._search("earch"), [1, 4])
+
+            members = Alumni.objects.filter(pk__in=[1, 10])
+            ordered = fulltext.order_by_rank(members, ["engineer"], "pk")
+            self.assertListEqual([a.pk for a in ordered], [1, 10])
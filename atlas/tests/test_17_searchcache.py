@@ -0,0 +1,104 @@
+from __future__ import annotations
+
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.db.models import Q
+from django.test import RequestFactory, TestCase
+from django.urls import reverse
+
+from atlas.models import SearchDocument
+from atlas.views import SearchView, search
+from registry.search.filter import CacheInfo, ParsingError, SearchFilter
+
+
+class SearchCacheTest(TestCase):
+    fixtures = ["registry/tests/fixtures/integration.json"]
+
+    def setUp(self) -> None:
+        self.filter = SearchFilter(
+            {"city": "address__city"}, ["givenName", "familyName"], cache_size=2
+        )
+
+    def test_hits(self) -> None:
+        q, err = self.filter(None, "Elena")
+        self.assertIsNone(err)
+        self.assertEqual(self.filter.cache_info(), CacheInfo(0, 1, 2, 1))
+
+        # surrounding whitespace does not matter
+        self.assertEqual(self.filter(None, " Elena  "), (q, None))
+        self.assertEqual(self.filter.cache_info(), CacheInfo(1, 1, 2, 1))
+
+        self.assertListEqual(self.filter.text_terms("Elena"), ["Elena"])
+        self.assertEqual(self.filter.cache_info(), CacheInfo(2, 1, 2, 1))
+
+    def test_no_reparse(self) -> None:
+        self.filter(None, "city: Bremen")
+        with mock.patch.object(self.filter.parser, "parse") as parse:
+            self.filter(None, "city: Bremen")
+            parse.assert_not_called()
+
+    def test_origin(self) -> None:
+        self.filter(None, "Elena", origin=(53.1, 8.8))
+        self.filter(None, "Elena", origin=(51.1, 12.4))
+        self.assertEqual(self.filter.cache_info(), CacheInfo(0, 2, 2, 2))
+
+    def test_errors(self) -> None:
+        _, err = self.filter(None, "unknown: field")
+        self.assertIsInstance(err, ParsingError)
+
+        _, again = self.filter(None, "unknown: field")
+        self.assertIs(again, err)
+        self.assertEqual(self.filter.cache_info().hits, 1)
+
+    def test_eviction(self) -> None:
+        self.filter(None, "a")
+        self.filter(None, "b")
+        self.filter(None, "a")
+        self.filter(None, "c")  # evicts "b", the least recently used
+
+        self.filter(None, "a")
+        self.assertEqual(self.filter.cache_info(), CacheInfo(2, 3, 2, 2))
+        self.filter(None, "b")
+        self.assertEqual(self.filter.cache_info(), CacheInfo(2, 4, 2, 2))
+
+        self.filter.cache_clear()
+        self.assertEqual(self.filter.cache_info(), CacheInfo(0, 0, 2, 0))
+
+    def test_near_not_cached(self) -> None:
+        near_fn = mock.Mock(side_effect=[ValueError("Unknown place: Atlantis"), Q()])
+        self.filter = SearchFilter(
+            {"city": "address__city"}, ["givenName"], near_fn=near_fn, cache_size=2
+        )
+
+        # the place may become known, e.g. once a member moves there
+        _, err = self.filter(None, 'Elena near: "Atlantis"')
+        self.assertEqual(err.message, "Unknown place: Atlantis")
+        _, err = self.filter(None, 'Elena near: "Atlantis"')
+        self.assertIsNone(err)
+
+        self.assertEqual(near_fn.call_count, 2)
+        self.assertEqual(self.filter.cache_info().currsize, 0)
+
+    def test_text_search_required(self) -> None:
+        with self.assertRaises(ValueError):
+            SearchFilter({"city": "address__city"}, [])
+
+    def test_view(self) -> None:
+        SearchDocument.rebuild()
+        search.cache_clear()
+        self.addCleanup(search.cache_clear)
+
+        user = User.objects.get(username="Mounfem")
+        for query in ["Bremen", " Bremen"]:
+            request = RequestFactory().get(reverse("atlas_search"), {"query": query})
+            request.user = user
+
+            view = SearchView()
+            view.setup(request)
+            view.object_list = view.get_queryset()
+            self.assertNotIn("error", view.get_context_data())
+
+        info = search.cache_info()
+        self.assertEqual(info.misses, 1)
+        self.assertEqual(info.currsize, 1)
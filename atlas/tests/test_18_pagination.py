@@ -0,0 +1,141 @@
+from __future__ import annotations
+
+from django.contrib.auth.models import User
+from django.db import connection
+from django.test import RequestFactory, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from alumni.models import Alumni
+from atlas.models import MemberLocation
+from atlas.pagination import CappedPaginator, InvalidCursor, KeysetPaginator
+from atlas.views import SearchView, make_pagination_ui_ctx
+
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from typing import Any, Dict, List
+
+
+class KeysetPaginationTest(TestCase):
+    fixtures = ["registry/tests/fixtures/integration.json"]
+
+    def setUp(self) -> None:
+        # several members with the same family name
+        Alumni.objects.filter(pk__in=[2, 5, 7, 8]).update(familyName="Smith")
+
+        self.paginator = KeysetPaginator(Alumni.objects.all(), 3, ("familyName", "pk"))
+        self.expected = list(
+            Alumni.objects.order_by("familyName", "pk").values_list("pk", flat=True)
+        )
+
+    def test_forward_and_back(self) -> None:
+        pages: List[List[int]] = []
+
+        page = self.paginator.page()
+        self.assertFalse(page.has_previous())
+        while True:
+            pages.append([a.pk for a in page])
+            self.assertEqual(page.number, len(pages))
+            if not page.has_next():
+                break
+            page = self.paginator.page(page.next_cursor)
+
+        self.assertListEqual([pk for p in pages for pk in p], self.expected)
+        self.assertEqual(len(pages), 4)
+        self.assertIsNone(page.next_cursor)
+
+        # and back to the first page
+        while page.has_previous():
+            page = self.paginator.page(page.previous_cursor)
+            self.assertListEqual([a.pk for a in page], pages[page.number - 1])
+            self.assertTrue(page.has_next())
+        self.assertEqual(page.number, 1)
+
+    def test_queries(self) -> None:
+        page = self.paginator.page()
+        cursor = page.next_cursor
+
+        with self.assertNumQueries(1):
+            self.assertEqual(len(self.paginator.page(cursor)), 3)
+
+    def test_invalid_cursor(self) -> None:
+        for cursor in ["garbage", self.paginator.page().next_cursor + "x"]:
+            with self.assertRaises(InvalidCursor):
+                self.paginator.page(cursor)
+
+    def test_pagination_ui(self) -> None:
+        page = self.paginator.page(self.paginator.page().next_cursor)
+        self.assertIsNone(page.paginator.num_pages)
+        self.assertDictEqual(
+            make_pagination_ui_ctx(page),
+            {
+                "print1": False,
+                "print1Dots": False,
+                "printL": False,
+                "printLDots": False,
+            },
+        )
+
+    @override_settings(ATLAS_SEARCH_PAGINATION="keyset")
+    def test_view(self) -> None:
+        MemberLocation.rebuild()
+
+        context = self._context(bbox="-90,-180,90,180")
+        self.assertTrue(context["page"].has_next())
+        self.assertIsNone(context["page"].paginator.count)
+
+        context = self._context(bbox="-90,-180,90,180", cursor="garbage")
+        self.assertEqual(context["page"].number, 1)
+
+    def _context(self, **params: str) -> Dict[str, Any]:
+        request = RequestFactory().get(reverse("atlas_search"), params)
+        request.user = User.objects.get(username="Mounfem")
+
+        view = SearchView()
+        view.setup(request)
+        view.paginate_by = 2
+        view.object_list = view.get_queryset()
+        context = view.get_context_data()
+        self.assertNotIn("error", context)
+        return context
+
+
+class CappedPaginationTest(TestCase):
+    fixtures = ["registry/tests/fixtures/integration.json"]
+
+    def test_capped(self) -> None:
+        paginator = CappedPaginator(Alumni.objects.order_by("pk"), 2, 5)
+
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(paginator.count, 5)
+        self.assertEqual(len(queries), 1)
+        self.assertIn("LIMIT 6", queries[0]["sql"])
+
+        self.assertTrue(paginator.capped)
+        self.assertEqual(paginator.total, "5+")
+        self.assertEqual(paginator.num_pages, 3)
+        self.assertListEqual([a.pk for a in paginator.page(3)], [5])
+
+    def test_not_capped(self) -> None:
+        paginator = CappedPaginator(Alumni.objects.order_by("pk"), 2, 100)
+        self.assertEqual(paginator.count, Alumni.objects.count())
+        self.assertFalse(paginator.capped)
+        self.assertEqual(paginator.total, str(Alumni.objects.count()))
+
+    @override_settings(ATLAS_SEARCH_PAGINATION="capped", ATLAS_SEARCH_COUNT_LIMIT=3)
+    def test_view(self) -> None:
+        MemberLocation.rebuild()
+
+        request = RequestFactory().get(
+            reverse("atlas_search"), {"bbox": "-90,-180,90,180"}
+        )
+        request.user = User.objects.get(username="Mounfem")
+
+        view = SearchView()
+        view.setup(request)
+        view.object_list = view.get_queryset()
+        context = view.get_context_data()
+
+        self.assertEqual(context["total"], "3+")
+        self.assertEqual(len(context["page"]), 3)
@@ -0,0 +1,114 @@
+from __future__ import annotations
+
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from alumni.models import Alumni
+from atlas import fulltext
+from atlas.models import MemberLocation, SearchDocument
+from atlas.views import FACETS, search
+
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from typing import Dict
+    from django.http import HttpResponse
+
+
+# session, user, location of the user, count and results
+SEARCH_QUERIES = 5
+
+# checking if a regular member may view the atlas: member, approval, atlas
+# settings and address
+ACCESS_QUERIES = 4
+
+# one per facet, unless cached
+FACET_QUERIES = len(FACETS)
+
+# facets count a capped sample of the results, unless paginated by pages
+FACET_SAMPLE_QUERIES = 1
+
+# session, user, member with all components, and location
+PROFILE_QUERIES = 4
+
+
+@mock.patch("webpack_loader.utils.get_entrypoint_files_as_tags", return_value=[])
+class QueryBudgetTest(TestCase):
+    fixtures = ["registry/tests/fixtures/integration.json"]
+
+    def setUp(self) -> None:
+        MemberLocation.rebuild()
+        SearchDocument.rebuild()
+        search.cache_clear()
+        cache.clear()
+        fulltext.backend()
+
+        # a regular member, as superusers skip checking their membership
+        user = User.objects.get(username="Aint1975")
+        self.assertFalse(user.is_superuser or user.is_staff)
+        self.client.force_login(user)
+
+    def _search(self, params: Dict[str, str], results: int) -> HttpResponse:
+        response = self.client.get(reverse("atlas_search"), params)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.content.count(b"search_result_link"), results)
+        return response
+
+    def test_search(self, _) -> None:
+        # the same number of queries, independent of the number of results
+        with self.assertNumQueries(ACCESS_QUERIES + SEARCH_QUERIES + FACET_QUERIES):
+            self._search({"query": "Elena"}, 1)
+
+        with self.assertNumQueries(ACCESS_QUERIES + SEARCH_QUERIES + FACET_QUERIES):
+            response = self._search({"bbox": "-90,-180,90,180"}, 6)
+        self.assertContains(response, "Bremen")
+
+        # facet counts are cached
+        with self.assertNumQueries(ACCESS_QUERIES + SEARCH_QUERIES):
+            self._search({"bbox": "-90,-180,90,180"}, 6)
+
+    @override_settings(ATLAS_SEARCH_PAGINATION="capped", ATLAS_SEARCH_COUNT_LIMIT=3)
+    def test_search_capped(self, _) -> None:
+        with self.assertNumQueries(
+            ACCESS_QUERIES + SEARCH_QUERIES + FACET_SAMPLE_QUERIES + FACET_QUERIES
+        ):
+            response = self._search({"bbox": "-90,-180,90,180"}, 3)
+        self.assertContains(response, "+</span>")
+
+    @override_settings(ATLAS_SEARCH_PAGINATION="keyset", ATLAS_SEARCH_COUNT_LIMIT=3)
+    def test_search_keyset(self, _) -> None:
+        # results are not counted
+        with self.assertNumQueries(
+            ACCESS_QUERIES + SEARCH_QUERIES - 1 + FACET_SAMPLE_QUERIES + FACET_QUERIES
+        ):
+            response = self._search({"bbox": "-90,-180,90,180"}, 6)
+        self.assertContains(response, "+</span>")
+
+    def test_profile(self, _) -> None:
+        member = Alumni.objects.get(profile__username="Mounfem")
+        url = reverse("atlas_profile", kwargs={"id": member.pk})
+
+        with self.assertNumQueries(ACCESS_QUERIES + PROFILE_QUERIES):
+            response = self.client.get(url)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, member.fullName)
+        self.assertContains(response, member.job.employer)
+        self.assertContains(response, member.skills.spokenLanguages)
+
+    def test_profiles(self, _) -> None:
+        # the same number of queries for every profile, however complete
+        members = Alumni.objects.filter(
+            approval__approval=True, atlas__included=True
+        ).order_by("pk")
+        self.assertGreater(len(members), 1)
+
+        for member in members:
+            url = reverse("atlas_profile", kwargs={"id": member.pk})
+            with self.assertNumQueries(ACCESS_QUERIES + PROFILE_QUERIES):
+                response = self.client.get(url)
+            self.assertContains(response, member.fullName)
@@ -0,0 +1,112 @@
+from __future__ import annotations
+
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.test import RequestFactory, TestCase, override_settings
+from django.urls import reverse
+
+from alumni.models import Alumni
+from atlas import facets
+from atlas.models import MemberLocation, SearchDocument
+from atlas.views import FACETS, SearchView, search
+
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from typing import Any, Dict
+
+
+class FacetTest(TestCase):
+    fixtures = ["registry/tests/fixtures/integration.json"]
+
+    def setUp(self) -> None:
+        MemberLocation.rebuild()
+        SearchDocument.rebuild()
+        search.cache_clear()
+        cache.clear()
+
+    def _context(self, **params: str) -> Dict[str, Any]:
+        request = RequestFactory().get(reverse("atlas_search"), params)
+        request.user = User.objects.get(username="Mounfem")
+
+        view = SearchView()
+        view.setup(request)
+        view.object_list = view.get_queryset()
+        context = view.get_context_data()
+        self.assertNotIn("error", context)
+        return context
+
+    def test_counts(self) -> None:
+        counts = facets.counts(
+            Alumni.objects.all(),
+            [("country", "address__country", [("DE", "Germany")])],
+        )
+        self.assertEqual(counts["country"][0], ("DE", "Germany", 4))
+        self.assertEqual(
+            sum(count for _, _, count in counts["country"]),
+            Alumni.objects.filter(address__country__isnull=False).count(),
+        )
+
+    def test_facets(self) -> None:
+        context = self._context(bbox="-90,-180,90,180")
+        names = [facet["name"] for facet in context["facets"]]
+        self.assertListEqual(names, [name for name in FACETS if name in names])
+        self.assertIn("country", names)
+
+        # the counts match the searches the facets link to
+        for facet in context["facets"]:
+            total = 0
+            for value in facet["values"]:
+                refined = self._context(bbox="-90,-180,90,180", query=value["query"])
+                self.assertEqual(len(refined["page"]), value["count"], value["query"])
+                total += value["count"]
+            self.assertLessEqual(total, 6)
+
+    def test_facets_query(self) -> None:
+        context = self._context(query="Bremen")
+        [country] = [f for f in context["facets"] if f["name"] == "country"]
+        self.assertListEqual(
+            country["values"],
+            [
+                {
+                    "label": "Germany",
+                    "count": 1,
+                    "total": "1",
+                    "query": 'Bremen country: "DE"',
+                }
+            ],
+        )
+
+    def test_capped_counts(self) -> None:
+        results = Alumni.objects.filter(address__country="DE")
+        specs = [("country", "address__country", [("DE", "Germany")])]
+
+        counts, capped = facets.capped_counts(results, specs, 3)
+        self.assertTrue(capped)
+        self.assertEqual(counts["country"], [("DE", "Germany", 3)])
+
+        counts, capped = facets.capped_counts(results, specs, 4)
+        self.assertFalse(capped)
+        self.assertEqual(counts["country"], [("DE", "Germany", 4)])
+
+    @override_settings(ATLAS_SEARCH_PAGINATION="keyset", ATLAS_SEARCH_COUNT_LIMIT=3)
+    def test_facets_capped(self) -> None:
+        context = self._context(bbox="-90,-180,90,180")
+        for facet in context["facets"]:
+            self.assertLessEqual(sum(v["count"] for v in facet["values"]), 3)
+            for value in facet["values"]:
+                self.assertEqual(value["total"], "{}+".format(value["count"]))
+
+    def test_cached(self) -> None:
+        with mock.patch("atlas.facets.counts", wraps=facets.counts) as counts:
+            first = self._context(query="Bremen")["facets"]
+            second = self._context(query=" Bremen ")["facets"]
+            self._context(query="Bremen", page="2")
+            self.assertEqual(counts.call_count, 1)
+
+            self._context(query="Elena")
+            self.assertEqual(counts.call_count, 2)
+
+        self.assertListEqual(first, second)
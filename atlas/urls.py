@@ -2,10 +2,16 @@ from __future__ import annotations
 
 from django.urls import path
 
-from .views import HomeView, SearchView, ProfileView
+from .views import (
+    HomeView,
+    ClustersView,
+    SearchView,
+    ProfileView,
+)
 
 urlpatterns = [
     path("search/", SearchView.as_view(), name="atlas_search"),
     path("profile/<int:id>/", ProfileView.as_view(), name="atlas_profile"),
+    path("clusters.json", ClustersView.as_view(), name="atlas_clusters"),
     path("", HomeView.as_view(), name="atlas_home"),
 ]
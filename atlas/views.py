@@ -1,12 +1,31 @@
 from __future__ import annotations
 
+import gzip
+import hashlib
+import json
+
+try:
+    import brotli
+except ImportError:  # brotli is optional
+    brotli = None
+
+from django.conf import settings
 from django.contrib.auth.decorators import login_required
 from django.core.exceptions import ObjectDoesNotExist
 from django.core.paginator import EmptyPage, PageNotAnInteger, Paginator
-from django.http import Http404
+from django.core.cache import cache
+from django.db.models import Q
+from django.http import Http404, HttpResponse, HttpResponseBadRequest
 from django.shortcuts import get_object_or_404, redirect
 from django.urls import reverse
+from django.utils.cache import (
+    get_conditional_response,
+    patch_cache_control,
+    patch_vary_headers,
+)
 from django.utils.decorators import method_decorator
+from django.utils.http import http_date, quote_etag
+from django.views import View
 from django.views.generic import ListView, TemplateView, DetailView
 from django.contrib.auth.mixins import LoginRequiredMixin, UserPassesTestMixin
 
@@ -19,43 +38,42 @@ from alumni.fields import (
     JobField,
     MajorField,
 )
-from alumni.models import Address, Alumni
+from alumni.models import Alumni
+from atlas import clustering, facets, fulltext, spatial
+from atlas.pagination import CappedPaginator, InvalidCursor, KeysetPaginator
+from atlas.models import MemberLocation
 
 # Create a new SearchFilter instance
+from registry.search import operators as ops
 from registry.search.filter import ParsingError, SearchFilter
 
 from typing import TYPE_CHECKING
 
 if TYPE_CHECKING:
-    from typing import Dict, Any
+    from typing import Dict, Any, List, Optional, Tuple
     from django.contrib.auth.models import User
     from django.core.paginator import Paginator
-    from django.http import HttpRequest, HttpResponse
-
+    from django.db.models import QuerySet
+    from django.http import HttpRequest
+    from atlas.pagination import KeysetPage
+
+# fields that can be searched for by name, e.g. 'city: Bremen'
+SEARCH_FIELD_MAP = {
+    "city": "address__city",
+    "country": "address__country",
+    "class": "jacobs__graduation",
+    "college": "jacobs__college",
+    "major": "jacobs__major",
+    "degree": "jacobs__degree",
+    "industry": "job__industry",
+    "job": "job__job",
+}
+
+# plain text is searched for in SearchDocuments, see SearchDocument.FIELDS
 search = SearchFilter(
-    {
-        "city": "address__city",
-        "country": "address__country",
-        "class": "jacobs__graduation",
-        "college": "jacobs__college",
-        "major": "jacobs__major",
-        "degree": "jacobs__degree",
-        "industry": "job__industry",
-        "job": "job__job",
-    },
-    [
-        "givenName",
-        "familyName",
-        "address__city",
-        "jacobs__degree",
-        "skills__otherDegrees",
-        "skills__spokenLanguages",
-        "skills__programmingLanguages",
-        "skills__areasOfInterest",
-        "job__employer",
-        "job__position",
-        "atlas__secret",
-    ],
+    SEARCH_FIELD_MAP,
+    near_fn=spatial.near_query,
+    text_fn=fulltext.text_query,
 )
 
 ADVANCED_SEARCH_FIELDS = [
@@ -68,6 +86,9 @@ ADVANCED_SEARCH_FIELDS = [
     ["country", "Country", CountryField.COUNTRY_CHOICES],
 ]
 
+# search fields results are counted by, along with the results
+FACETS = ["country", "class", "major", "degree", "industry", "job"]
+
 
 def can_view_atlas(user: User) -> bool:
     """Function that checks if access to atlas functionality is available"""
@@ -114,7 +135,7 @@ def make_pagination_ui_ctx(page: Paginator) -> Dict[str, Any]:
     p = page.has_previous() and page.previous_page_number()
     c = page.number
     n = page.has_next() and page.next_page_number()
-    l = page.paginator.num_pages
+    l = page.paginator.num_pages  # None when results are not counted
 
     # Start figuring out if we need the one and the dots
     if not p or p == 1:
@@ -131,7 +152,7 @@ def make_pagination_ui_ctx(page: Paginator) -> Dict[str, Any]:
     context["print1Dots"] = print1Dots
 
     # End by figuring out if we need the last tods etc
-    if not n or n == l:
+    if not n or l is None or n == l:
         printL = False
         printLDots = False
     elif n == l - 1:
@@ -158,13 +179,141 @@ class HomeView(TemplateView, LoginRequiredMixin):
     def get_context_data(self, **kwargs) -> Dict[str, Any]:
         context = super().get_context_data(**kwargs)
         context["search_fields"] = ADVANCED_SEARCH_FIELDS
+        return context
+
+
+class AtlasDataView(View):
+    """Base class for views serving (part of) the member locations on the atlas.
 
-        coords = map(
-            lambda x: "[{}, {}]".format(x[0], x[1]), Address.all_valid_coords()
+    Responses carry a strong ETag derived from the MemberLocation version, so
+    clients can cheaply revalidate them. Compressed bodies are computed once
+    per version and then served from the cache.
+    """
+
+    content_type = "application/json"
+    format_name: str = None
+
+    # seconds rendered bodies are cached for
+    cache_timeout = 60 * 60
+
+    # encodings we can serve in order of preference
+    ENCODINGS = ["br", "gzip"] if brotli is not None else ["gzip"]
+
+    def get_variant(self, request: HttpRequest) -> str:
+        """Returns a string identifying the parameters of this request.
+        Raises ValueError when they are invalid."""
+        return ""
+
+    def render(self, request: HttpRequest, version: str) -> bytes:
+        """Renders the body of the response"""
+        raise NotImplementedError
+
+    def get(self, request: HttpRequest, *args, **kwargs) -> HttpResponse:
+        if not can_view_atlas(request.user):
+            raise Http404
+
+        try:
+            variant = self.get_variant(request)
+        except ValueError as e:
+            return HttpResponseBadRequest(str(e))
+
+        count, updated = MemberLocation.version()
+        encoding = self._negotiate_encoding(request)
+
+        version = hashlib.sha1(
+            "{}-{}".format(count, updated.isoformat() if updated else "").encode(
+                "utf-8"
+            )
+        ).hexdigest()
+        etag = quote_etag(
+            "{}-{}-{}".format(
+                version,
+                hashlib.sha1(
+                    "{}-{}".format(self.format_name, variant).encode("utf-8")
+                ).hexdigest()[:16],
+                encoding or "identity",
+            )
         )
-        context["people_coords"] = "[{}]".format(",".join(coords))
+        last_modified = updated.timestamp() if updated else None
 
-        return context
+        response = get_conditional_response(
+            request, etag=etag, last_modified=last_modified
+        )
+        if response is None:
+            response = HttpResponse(
+                self._get_body(request, etag, version, encoding),
+                content_type=self.content_type,
+            )
+            if encoding is not None:
+                response["Content-Encoding"] = encoding
+
+        response["ETag"] = etag
+        if last_modified is not None:
+            response["Last-Modified"] = http_date(last_modified)
+
+        # the data is only visible to logged in users, but does not depend on them
+        patch_cache_control(response, private=True, no_cache=True)
+        patch_vary_headers(response, ("Accept-Encoding", "Cookie"))
+        return response
+
+    def _negotiate_encoding(self, request: HttpRequest) -> Optional[str]:
+        """Picks the content encoding to use for the given request"""
+        accepted = [
+            part.split(";")[0].strip()
+            for part in request.META.get("HTTP_ACCEPT_ENCODING", "").split(",")
+        ]
+        for encoding in self.ENCODINGS:
+            if encoding in accepted:
+                return encoding
+        return None
+
+    def _get_body(
+        self, request: HttpRequest, etag: str, version: str, encoding: Optional[str]
+    ) -> bytes:
+        """Returns the (possibly compressed) body for the given etag"""
+        key = "atlas.data.{}".format(hashlib.sha1(etag.encode("utf-8")).hexdigest())
+
+        body = cache.get(key)
+        if body is not None:
+            return body
+
+        body = self.render(request, version)
+        if encoding == "gzip":
+            body = gzip.compress(body, mtime=0)
+        elif encoding == "br":
+            body = brotli.compress(body)
+
+        cache.set(key, body, self.cache_timeout)
+        return body
+
+
+class ClustersView(AtlasDataView):
+    """Serves pre-aggregated clusters of members for a zoom level and bounding box"""
+
+    format_name = "clusters"
+
+    def _get_params(self, request: HttpRequest) -> Tuple[int, List[Tuple[int, int]]]:
+        """Returns the zoom level and the tiles covering the bounding box"""
+        try:
+            zoom = int(request.GET.get("zoom", ""))
+        except ValueError:
+            raise ValueError("Expected an integer 'zoom' parameter")
+        bbox = spatial.parse_bbox(request.GET.get("bbox", ""))
+
+        try:
+            return zoom, clustering.tiles_for_bbox(zoom, *bbox)
+        except clustering.ClusteringError as e:
+            raise ValueError(str(e))
+
+    def get_variant(self, request: HttpRequest) -> str:
+        # the response only depends on the tiles, not on the exact box
+        zoom, tiles = self._get_params(request)
+        return "{}-{}".format(zoom, ",".join("{}:{}".format(x, y) for x, y in tiles))
+
+    def render(self, request: HttpRequest, version: str) -> bytes:
+        zoom, tiles = self._get_params(request)
+        clusters = clustering.clusters_for_tiles(version, zoom, tiles)
+        return json.dumps(clusters, separators=(",", ":")).encode("utf-8")
 
 
 class ProfileView(DetailView, UserPassesTestMixin):
@@ -172,11 +321,58 @@ class ProfileView(DetailView, UserPassesTestMixin):
     template_name = "atlas/profile.html"
     pk_url_kwarg = "id"
 
+    # relations and fields used by the template
+    related = ["address", "atlas", "approval", "jacobs", "job", "skills", "social"]
+    fields = [
+        "givenName",
+        "middleName",
+        "familyName",
+        "category",
+        "birthday",
+        "address__city",
+        "address__country",
+        "address__zip",
+        "atlas__birthdayVisible",
+        "atlas__contactInfoVisible",
+        "atlas__reducedAccuracy",
+        "approval__gsuite",
+        "jacobs__college",
+        "jacobs__degree",
+        "jacobs__graduation",
+        "job__employer",
+        "job__position",
+        "job__industry",
+        "job__job",
+        "skills__otherDegrees",
+        "skills__spokenLanguages",
+        "skills__programmingLanguages",
+        "skills__areasOfInterest",
+        "social__facebook",
+        "social__linkedin",
+        "social__twitter",
+        "social__instagram",
+        "social__homepage",
+    ]
+
     def get_queryset(self):
         return (
-            super().get_queryset().filter(approval__approval=True, atlas__included=True)
+            super()
+            .get_queryset()
+            .filter(approval__approval=True, atlas__included=True)
+            .select_related(*self.related)
+            .only(*self.fields)
         )
 
+    def get_context_data(self, **kwargs) -> Dict[str, Any]:
+        context = super().get_context_data(**kwargs)
+
+        try:
+            context["coords"] = self.object.address.coords
+        except ObjectDoesNotExist:
+            context["coords"] = [None, None]
+
+        return context
+
     def test_func(self):
         return can_view_atlas(self.request.user)
 
@@ -188,11 +384,33 @@ class SearchView(ListView, LoginRequiredMixin):
 
     ordering = "familyName"
 
+    # unique keys results are ordered by when using keyset pagination
+    keyset = ("familyName", "pk")
+
+    # relations and fields used by the template
+    related = ["address", "jacobs"]
+    fields = [
+        "givenName",
+        "familyName",
+        "address__city",
+        "address__country",
+        "jacobs__degree",
+        "jacobs__graduation",
+    ]
+
     def get_queryset(self):
         return (
-            super().get_queryset().filter(approval__approval=True, atlas__included=True)
+            super()
+            .get_queryset()
+            .filter(approval__approval=True, atlas__included=True)
+            .select_related(*self.related)
+            .only(*self.fields)
         )
 
+    def get_paginate_by(self, queryset) -> None:
+        # results are paginated in get_context_data, not by ListView
+        return None
+
     def get_context_data(self, **kwargs) -> Dict[str, Any]:
 
         # Get the context from the parent
@@ -203,13 +421,21 @@ class SearchView(ListView, LoginRequiredMixin):
         query = self.request.GET.get("query") or ""
         context["query"] = query
 
+        # Read out the viewport to restrict results to
+        bbox = self.request.GET.get("bbox") or ""
+        context["bbox"] = bbox
+
         # Read out the page number
         page = self.request.GET.get("page")
 
         # build a query
         # and also build a search
         queryset = self.get_queryset()
-        q, err = search(queryset, query)
+        origin = self._get_origin()
+        if query.strip():
+            q, err = search(queryset, query, origin=origin)
+        else:
+            q, err = Q(), None
 
         # If we had an error, raise it
         if err is not None:
@@ -219,26 +445,122 @@ class SearchView(ListView, LoginRequiredMixin):
 
             raise err
 
-        paginator = Paginator(queryset.filter(q), self.paginate_by)
+        if bbox:
+            try:
+                q &= spatial.within_bbox(*spatial.parse_bbox(bbox))
+            except ValueError as e:
+                context["error"] = str(e)
+                return context
 
-        try:
-            page = paginator.page(page)
-        except PageNotAnInteger:
-            page = paginator.page(1)
-        except EmptyPage:
-            page = paginator.page(paginator.num_pages)
+        if settings.ATLAS_SEARCH_PAGINATION == "keyset":
+            page = self._get_keyset_page(queryset.filter(q))
+        else:
+            # rank members by the relevance of the text searched for
+            results = fulltext.order_by_rank(
+                queryset.filter(q), search.text_terms(query, origin), self.ordering
+            )
+
+            if settings.ATLAS_SEARCH_PAGINATION == "capped":
+                paginator = CappedPaginator(
+                    results, self.paginate_by, settings.ATLAS_SEARCH_COUNT_LIMIT
+                )
+                context["total"] = paginator.total
+            else:
+                paginator = Paginator(results, self.paginate_by)
+                context["total"] = str(paginator.count)
+
+            try:
+                page = paginator.page(page)
+            except PageNotAnInteger:
+                page = paginator.page(1)
+            except EmptyPage:
+                page = paginator.page(paginator.num_pages)
 
         context["page"] = page
         context["pagination"] = make_pagination_ui_ctx(page)
+        context["facets"] = self._get_facets(queryset.filter(q), query, bbox, origin)
 
         return context
 
+    def _get_facets(
+        self,
+        results: QuerySet,
+        query: str,
+        bbox: str,
+        origin: Optional[Tuple[float, float]],
+    ) -> List[Dict[str, Any]]:
+        """Counts the results by the values of each facet.
+        Unless results are paginated by pages (and hence counted anyway), only
+        the first ATLAS_SEARCH_COUNT_LIMIT results are counted, e.g. '1000+'."""
+
+        fields = {
+            name: (label, choices) for name, label, choices in ADVANCED_SEARCH_FIELDS
+        }
+        specs = [(name, SEARCH_FIELD_MAP[name], fields[name][1]) for name in FACETS]
+
+        # results only depend on the origin for 'near' searches
+        key = [
+            query.strip(),
+            bbox.strip(),
+            origin if ops.NEAR_FIELD in query.lower() else None,
+        ]
+        limit = None
+        if settings.ATLAS_SEARCH_PAGINATION != "pages":
+            limit = settings.ATLAS_SEARCH_COUNT_LIMIT
+        counts, capped = facets.cached_counts(
+            key + [limit],
+            lambda: facets.capped_counts(results, specs, limit),
+            settings.ATLAS_SEARCH_FACETS_TIMEOUT,
+        )
+
+        return [
+            {
+                "name": name,
+                "label": fields[name][0],
+                "values": [
+                    {
+                        "label": label,
+                        "count": count,
+                        "total": "{}+".format(count) if capped else str(count),
+                        "query": '{} {}: "{}"'.format(
+                            query.strip(), name, value
+                        ).strip(),
+                    }
+                    for value, label, count in counts[name]
+                ],
+            }
+            for name in FACETS
+            if counts[name]
+        ]
+
+    def _get_keyset_page(self, results: QuerySet) -> KeysetPage:
+        """Returns the page of results referred to by the cursor parameter.
+        Results are ordered by family name, as there is no stable order by
+        relevance to continue from."""
+
+        paginator = KeysetPaginator(results, self.paginate_by, self.keyset)
+        try:
+            return paginator.page(self.request.GET.get("cursor"))
+        except InvalidCursor:
+            return paginator.page()
+
+    def _get_origin(self) -> Optional[Tuple[float, float]]:
+        """Returns the location of the searching user, if known"""
+        return (
+            MemberLocation.objects.filter(member__profile=self.request.user)
+            .values_list("lat", "lon")
+            .first()
+        )
+
     def get(self, request: HttpRequest, *args, **kwargs) -> HttpResponse:
         if not can_view_atlas(request.user):
             raise Http404
 
-        # if there is no search, redirect to home
-        if not self.request.GET.get("query", "").strip():
+        # if there is neither a search nor a viewport, redirect to home
+        if not (
+            self.request.GET.get("query", "").strip()
+            or self.request.GET.get("bbox", "").strip()
+        ):
             return redirect(reverse("atlas_home"))
 
         return super(SearchView, self).get(request, *args, **kwargs)
@@ -4,5 +4,8 @@ set -e
 # run database migrations
 python manage.py migrate --noinput
 
+# refresh the cached member locations of the atlas
+python manage.py atlascoords
+
 # startup with whatever command was provided
 "$@"
\ No newline at end of file
@@ -2,18 +2,49 @@ from __future__ import annotations
 
 from PreJsPy import PreJsPy
 import functools
+import threading
+from collections import OrderedDict, namedtuple
 
 from . import operators as ops
 
 from typing import TYPE_CHECKING
 
 if TYPE_CHECKING:
-    from typing import Dict, List, Optional, Any
+    from typing import Callable, Dict, List, Optional, Any, Tuple
     from django.db.models import QuerySet, Q
 
+# statistics of the cache of compiled searches, like functools.lru_cache
+CacheInfo = namedtuple("CacheInfo", ["hits", "misses", "maxsize", "currsize"])
+
+# message of a search using 'near' that can't be parsed
+NEAR_PARSING_ERROR = (
+    'Unable to understand search, use e.g. near: 50km or near: "Berlin" 20km'
+)
+
+# a compiled search
+Compiled = namedtuple("Compiled", ["q", "error", "text_terms"])
+
 
 class SearchFilter(object):
-    def __init__(self, field_map: Dict[str, str], plain_search_fields: List[str]) -> Q:
+    """Compiles searches into Q objects.
+
+    The most recently used cache_size searches are cached, hence repeated
+    searches (e.g. the pages of a search) are only parsed once. Searches
+    using 'near' are not cached, as near_fn may depend on the database
+    (e.g. when resolving the name of a place).
+
+    Plain text is searched for using text_fn, if given, and by substrings
+    of plain_search_fields otherwise.
+    """
+
+    def __init__(
+        self,
+        field_map: Dict[str, str],
+        plain_search_fields: Optional[List[str]] = None,
+        near_fn: Optional[Callable[[Any, Optional[Tuple[float, float]]], Q]] = None,
+        text_fn: Optional[Callable[[str], Q]] = None,
+        cache_size: int = 256,
+    ) -> Q:
         self.parser = PreJsPy()
         self.parser.setTertiaryOperatorEnabled(False)
         self.parser.setUnaryOperators(["not", "!", "~"])
@@ -56,30 +87,119 @@ class SearchFilter(object):
             }
         )
 
-        self.builder = QueryBuilder(field_map, plain_search_fields)
+        self.builder = QueryBuilder(field_map, plain_search_fields, near_fn, text_fn)
+
+        self.cache_size = cache_size
+        self._cache: OrderedDict[Tuple[str, Any], Compiled] = OrderedDict()
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+
+    def __call__(
+        self,
+        queryset: QuerySet,
+        query: str,
+        origin: Optional[Tuple[float, float]] = None,
+    ) -> (Q, Optional[Exception]):
+        compiled = self.compile(query, origin)
+        return compiled.q, compiled.error
+
+    def text_terms(
+        self, query: str, origin: Optional[Tuple[float, float]] = None
+    ) -> List[str]:
+        """Returns the plain text searched for by query"""
+        return self.compile(query, origin).text_terms
+
+    def compile(
+        self, query: str, origin: Optional[Tuple[float, float]] = None
+    ) -> Compiled:
+        """Compiles a query, or returns it from the cache"""
+
+        # the origin is part of the key, as it is part of 'near' queries
+        key = (query.strip(), origin)
+        with self._lock:
+            compiled = self._cache.get(key)
+            if compiled is not None:
+                self._cache.move_to_end(key)
+                self._hits += 1
+                return compiled
+            self._misses += 1
+
+        compiled, cacheable = self._compile(*key)
+        if not cacheable:
+            return compiled
+
+        with self._lock:
+            self._cache[key] = compiled
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+        return compiled
+
+    def _compile(
+        self, query: str, origin: Optional[Tuple[float, float]]
+    ) -> Tuple[Compiled, bool]:
+        """Compiles a query, and returns it along with whether it may be cached"""
+
+        if self.builder.near_fn is not None:
+            query = ops.quote_near(query)
 
-    def __call__(self, queryset: QuerySet, query: str) -> (Q, Optional[Exception]):
         try:
             parsed = self.parser.parse(query)
         except Exception as e:
-            return None, ParsingError("Unable to understand search", e)
+            message = "Unable to understand search"
+            if self.builder.near_fn is not None and ops.NEAR_SEARCH_PATTERN.search(
+                query
+            ):
+                message = NEAR_PARSING_ERROR
+            return Compiled(None, ParsingError(message, e), []), True
 
+        terms = self.builder.text_terms(parsed)
+        cacheable = not self.builder.uses_near(parsed)
+
+        token = ops.NEAR_ORIGIN.set(origin)
         try:
             q = self.builder(parsed)
         except ParsingError as p:
-            return None, p
+            return Compiled(None, p, terms), cacheable
         except Exception as e:
-            return None, ParsingError(str(e), e)
+            return Compiled(None, ParsingError(str(e), e), terms), cacheable
+        finally:
+            ops.NEAR_ORIGIN.reset(token)
+
+        return Compiled(q, None, terms), cacheable
 
-        return q, None
+    def cache_info(self) -> CacheInfo:
+        """Returns statistics of the cache of compiled searches"""
+        with self._lock:
+            return CacheInfo(
+                self._hits, self._misses, self.cache_size, len(self._cache)
+            )
+
+    def cache_clear(self) -> None:
+        """Clears the cache of compiled searches, and its statistics"""
+        with self._lock:
+            self._cache.clear()
+            self._hits = 0
+            self._misses = 0
 
 
 class QueryBuilder(object):
     """Generates a Django Q object from a PreJSPy filter JSON object"""
 
-    def __init__(self, field_map: Dict[str, str], plain_search_fields: List[str]):
-        self.ops = ops.get_operators(field_map)
+    def __init__(
+        self,
+        field_map: Dict[str, str],
+        plain_search_fields: Optional[List[str]] = None,
+        near_fn: Optional[Callable[[Any, Optional[Tuple[float, float]]], Q]] = None,
+        text_fn: Optional[Callable[[str], Q]] = None,
+    ):
+        if text_fn is None and not plain_search_fields:
+            raise ValueError("Either plain_search_fields or text_fn is required")
+
+        self.ops = ops.get_operators(field_map, near_fn)
+        self.near_fn = near_fn
         self.fields = plain_search_fields
+        self.text_fn = text_fn
 
     def __call__(self, filter_obj: Any) -> Q:
         return self.translate(filter_obj, finalize=True)
@@ -183,8 +303,48 @@ class QueryBuilder(object):
 
     def _finalize(self, s: str) -> Q:
         """Generates a string search"""
+        if self.text_fn is not None:
+            return self.text_fn(s)
         return ops.build_text_search(s, self.fields)
 
+    def text_terms(self, filter_obj: Any) -> List[str]:
+        """Returns the literals of filter_obj that are searched as plain text"""
+
+        if not filter_obj:
+            return []
+
+        obj_type = filter_obj.get("type")
+        if obj_type == ops.COMPOUND_TYPE:
+            return [
+                term
+                for part in filter_obj.get("body", [])
+                for term in self.text_terms(part)
+            ]
+        if obj_type == ops.IDENTITY_TYPE:
+            return [str(filter_obj.get("name", ""))]
+        if obj_type == ops.STRING_TYPE:
+            return [str(filter_obj.get("value", ""))]
+        return []
+
+    def uses_near(self, filter_obj: Any) -> bool:
+        """Checks if filter_obj contains a 'near' search implemented by near_fn"""
+
+        if self.near_fn is None or not isinstance(filter_obj, dict):
+            return False
+
+        if filter_obj.get("type") == ops.BIN_TYPE:
+            left = filter_obj.get("left")
+            if (
+                isinstance(left, dict)
+                and left.get("type") == ops.IDENTITY_TYPE
+                and left.get("name") == ops.NEAR_FIELD
+            ):
+                return True
+
+        children = [filter_obj.get(key) for key in ("left", "right", "argument")]
+        children.extend(filter_obj.get("body") or [])
+        return any(self.uses_near(child) for child in children)
+
 
 class ParsingError(Exception):
     def __init__(self, message: str, caused_by: Exception):
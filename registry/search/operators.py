@@ -4,6 +4,8 @@ definitions used in QBuilder."""
 from __future__ import annotations
 
 import operator
+import re
+from contextvars import ContextVar
 from django.db.models import Q
 
 import functools
@@ -11,7 +13,52 @@ import functools
 from typing import TYPE_CHECKING
 
 if TYPE_CHECKING:
-    from typing import Dict, List
+    from typing import Any, Callable, Dict, List, Optional, Tuple
+
+# name of the special field used for proximity searches, e.g. 'near: 50'
+NEAR_FIELD = "near"
+
+# the (lat, lon) origin of proximity searches for the current search
+NEAR_ORIGIN: ContextVar[Optional[Tuple[float, float]]] = ContextVar(
+    "NEAR_ORIGIN", default=None
+)
+
+# a 'near' search
+NEAR_SEARCH_PATTERN = re.compile(r"(?<![\w.])near\s*:(?!:)", re.IGNORECASE)
+
+# the value of a 'near' search with a radius, e.g. 'near: 50km',
+# 'near: "Berlin" 20km' or 'near: Berlin 20mi'. String literals are matched
+# first, so that 'near' inside of them is left alone.
+NEAR_VALUE_PATTERN = re.compile(
+    r'"(?P<literal>[^"]*)"|'
+    r"(?<![\w.])(?P<field>near\s*:)(?!:)\s*"
+    r'(?:(?:"(?P<quoted>[^"]*)"|(?P<word>[^\s"():]+))[\s,]+)?'
+    r"(?P<radius>\d+(?:\.\d+)?)(?:\s*(?P<unit>km|mi))?\b",
+    re.IGNORECASE,
+)
+
+
+def quote_near(query: str) -> str:
+    """Rewrites the values of 'near' searches into a single string, which
+    the parser otherwise doesn't understand, e.g. 'near: "Berlin" 20km'
+    becomes 'near: "Berlin 20km"'."""
+
+    def quote(match: re.Match) -> str:
+        if match.group("literal") is not None:
+            return match.group(0)
+
+        place = match.group("quoted") or match.group("word")
+        unit = match.group("unit")
+        # 'near: 50' and 'near: Berlin 2020' are left alone
+        if unit is None and match.group("quoted") is None:
+            return match.group(0)
+
+        value = match.group("radius") + (unit or "")
+        if place:
+            value = "{} {}".format(place, value)
+        return '{} "{}"'.format(match.group("field"), value)
+
+    return NEAR_VALUE_PATTERN.sub(quote, query)
 
 
 def build_text_search(text: str, fields: Dict[str, str]) -> Q:
@@ -46,8 +93,13 @@ def build_text_search(text: str, fields: Dict[str, str]) -> Q:
     return functools.reduce(operator.and_, searches)
 
 
-def get_operators(field_map: List[str]) -> Dict[str, Dict[str, Callable[..., Q]]]:
-    """Gets implementations of operators"""
+def get_operators(
+    field_map: List[str],
+    near_fn: Optional[Callable[[Any, Optional[Tuple[float, float]]], Q]] = None,
+) -> Dict[str, Dict[str, Callable[..., Q]]]:
+    """Gets implementations of operators.
+    When near_fn is given, 'near: value' is implemented by calling it with
+    the value and the origin of the current search."""
 
     # Binary logic expressions
     and_fn = operator.and_
@@ -63,6 +115,11 @@ def get_operators(field_map: List[str]) -> Dict[str, Dict[str, Callable[..., Q]]
 
     def q_lambda(dj_filter="exact"):
         def impl(x, y):
+            if x == NEAR_FIELD and near_fn is not None:
+                if dj_filter != "exact":
+                    raise KeyError("Can only use ':' with {}".format(NEAR_FIELD))
+                return near_fn(y, NEAR_ORIGIN.get())
+
             if not x in field_map:
                 raise KeyError("Unknown search field: {}".format(x))
             return Q(**{field_map[x] + "__" + dj_filter: y})